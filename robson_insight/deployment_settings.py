@@ -43,6 +43,15 @@ DATABASES = {
 }
 
 
+# Shared by every worker process on the instance, so membership
+# invalidations are seen by all of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -114,6 +114,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "robson-insight",
+    }
+}
+
+# Seconds a user's cached group memberships live; UserProfile saves and
+# deletes invalidate them immediately
+MEMBERSHIP_CACHE_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -152,6 +167,23 @@ STATIC_URL = "static/"
 
 STATIC_ROOT = "staticfiles/"
 
+# Generated export files
+MEDIA_ROOT = BASE_DIR / "media"
+
+MEDIA_URL = "media/"
+
+# Finished export jobs and their files are deleted after this many days
+EXPORT_JOB_RETENTION_DAYS = 7
+
+# Upload and export jobs still running after this many seconds are taken to
+# belong to a worker that crashed, and are failed
+JOB_TIMEOUT_SECONDS = 60 * 60
+
+# Generated CSV and workbook downloads, reused until their groups change
+EXPORT_CACHE_DIR = BASE_DIR / "export_cache"
+
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .ingest import SHEET_EXTENSIONS, add_entry_counts, iter_upload_rows, parse_quarterly_rows, replaced_quarters
+from users.models import Group
+
+
+def archive_workers():
+    return getattr(settings, 'UPLOAD_ARCHIVE_WORKERS', None) or min(4, os.cpu_count() or 1)
+
+
+def read_archive(data):
+    """
+    Yield (name, bytes) for every spreadsheet in a zip archive, given as
+    bytes or a binary file, skipping folders and OS metadata.
+    """
+    source = BytesIO(data) if isinstance(data, bytes) else data
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith('__MACOSX/') or posixpath.basename(name).startswith('.'):
+                continue
+            yield name, archive.read(info)
+
+
+def parse_sheet(name, data):
+    """
+    Parse one spreadsheet into cells. Runs inside the process pool, so
+    errors are returned rather than raised.
+    """
+    try:
+        upload = ContentFile(data, name=posixpath.basename(name))
+        return list(parse_quarterly_rows(iter_upload_rows(upload))), None
+    except Exception as e:
+        return None, str(e)
+
+
+def parse_archive(data, workers=None):
+    """Parse every sheet of an archive in parallel and return [(name, cells, error)] in archive order."""
+    sheets = list(read_archive(data))
+    workers = workers or archive_workers()
+
+    if workers <= 1 or len(sheets) <= 1:
+        results = [parse_sheet(name, payload) for name, payload in sheets]
+    else:
+        # Spawned workers share no database connections with this process
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(sheets)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            results = list(pool.map(
+                parse_sheet,
+                [name for name, _ in sheets],
+                [payload for _, payload in sheets],
+            ))
+
+    return [(name, cells, error) for (name, _), (cells, error) in zip(sheets, results)]
+
+
+def sheet_group(name, groups_by_name):
+    # A sheet belongs to the group named by its file name or by one of its folders
+    stem, _ = posixpath.splitext(name)
+    for part in reversed(stem.split('/')):
+        group_id = groups_by_name.get(part.strip().lower())
+        if group_id is not None:
+            return group_id
+    return None
+
+
+def ingest_archive(data, group_ids, workers=None):
+    """
+    Parse a zip of quarterly sheets and record each one against the group
+    it is named after. Every sheet is committed in its own transaction.
+    Sheets that cover the same group and quarter as another sheet in the
+    archive are not recorded, since either would replace the other.
+
+    Returns a per-file report and the (group_id, quarter start) pairs the
+    ingested sheets replaced.
+    """
+    groups = Group.objects.filter(pk__in=group_ids)
+    groups_by_name = {group.name.strip().lower(): group.pk for group in groups}
+    group_names = {group.pk: group.name for group in groups}
+
+    report = []
+    sheets = []
+    for name, cells, error in parse_archive(data, workers):
+        summary = {'file': name, 'group': None, 'status': 'failed', 'count': 0, 'error': ''}
+        report.append(summary)
+
+        _, file_extension = posixpath.splitext(name)
+        if file_extension not in SHEET_EXTENSIONS:
+            summary.update(status='skipped', error='Not a .csv or .xlsx file')
+            continue
+        if error:
+            summary['error'] = error
+            continue
+
+        group_id = sheet_group(name, groups_by_name)
+        if group_id is None:
+            summary['error'] = 'File name does not match any of your groups'
+            continue
+
+        summary['group'] = group_names[group_id]
+        sheets.append((summary, cells, group_id, replaced_quarters(cells, [group_id])))
+
+    # Checked before anything is written, so neither sheet of a pair wins
+    files_by_quarter = {}
+    for summary, _, _, quarters in sheets:
+        for quarter in quarters:
+            files_by_quarter.setdefault(quarter, []).append(summary['file'])
+
+    replaced = set()
+    for summary, cells, group_id, quarters in sheets:
+        others = sorted({
+            name for quarter in quarters for name in files_by_quarter[quarter] if name != summary['file']
+        })
+        if others:
+            summary['error'] = f'Covers the same group and quarters as {", ".join(others)}'
+            continue
+
+        try:
+            stats = add_entry_counts(cells, [group_id], replace=True)
+        except Exception as e:
+            summary['error'] = str(e)
+            continue
+        summary.update(status='done', count=stats['count'])
+        replaced |= quarters
+
+    return report, replaced
@@ -0,0 +1,147 @@
+import csv
+import time
+import tracemalloc
+from datetime import date
+from io import BytesIO, StringIO
+
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from openpyxl import Workbook, load_workbook
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .ingest import iter_xlsx_rows, parse_quarterly_rows
+from .jobs import run_upload_job
+from .models import Entry, UploadJob
+from users.models import Group, UserProfile
+
+GROUP_LABELS = [label for _, label in Entry.CLASSIFICATIONS]
+
+QUARTER_LABELS = [
+    "Quarter 1: 1st July {0} - 30th September {0}",
+    "Quarter 2: 1st October {0} - 31st December {0}",
+    "Quarter 3: 1st January {1} - 31st March {1}",
+    "Quarter 4: 1st April {1} - 30th June {1}",
+]
+
+
+def synthetic_quarters(years, first_year=None):
+    # Default to quarters that have already ended so dates are not capped at "now"
+    if first_year is None:
+        first_year = date.today().year - years - 1
+    return [
+        label.format(year, year + 1)
+        for year in range(first_year, first_year + years)
+        for label in QUARTER_LABELS
+    ]
+
+
+def synthetic_sheet_rows(quarters, births_per_cell):
+    # Same layout as GenerateQuarterlyXLSX, every count cell set to births_per_cell
+    yield ["Group Robson"] + [value for quarter in quarters for value in (quarter, None)] + ["Final", None]
+    yield [None] + ["Vaginal Delivery", "C/Section"] * (len(quarters) + 1)
+    for label in GROUP_LABELS:
+        yield [label] + [births_per_cell] * (len(quarters) * 2)
+    yield ["No Record"] + [0] * (len(quarters) * 2)
+
+
+def synthetic_xlsx(quarters, births_per_cell):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Quarterly Data")
+    for row in synthetic_sheet_rows(quarters, births_per_cell):
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def synthetic_csv(quarters, births_per_cell):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for row in synthetic_sheet_rows(quarters, births_per_cell):
+        writer.writerow(['' if value is None else value for value in row])
+    return buffer.getvalue().encode('utf-8')
+
+
+def legacy_xlsx_cells(data):
+    # The pre-streaming path: scan for the header, then re-parse everything through pandas
+    workbook = load_workbook(BytesIO(data), read_only=True)
+    start_row = next(i for i, row in enumerate(workbook.active.iter_rows(values_only=True))
+                     if str(row[0]).strip().lower().startswith("group"))
+    df = pd.read_excel(BytesIO(data), skiprows=start_row, header=None)
+    return list(parse_quarterly_rows(df.itertuples(index=False, name=None)))
+
+
+def streaming_xlsx_cells(data):
+    return list(parse_quarterly_rows(iter_xlsx_rows(BytesIO(data))))
+
+
+def measure(func, *args):
+    """Run func(*args) and return (result, wall seconds, peak traced memory in bytes)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+SYNTHETIC_FILES = {
+    'csv': synthetic_csv,
+    'xlsx': synthetic_xlsx,
+}
+
+
+def benchmark_upload(file_format, quarters, births_per_cell):
+    """
+    Push one synthetic sheet through POST /survey/entries/upload/ and the
+    upload worker, then roll everything back.
+
+    Returns a dict with wall time, query count, births per second and peak
+    traced memory for the request and job together.
+    """
+    data = SYNTHETIC_FILES[file_format](quarters, births_per_cell)
+    result = {
+        'format': file_format,
+        'quarters': len(quarters),
+        'births_per_cell': births_per_cell,
+        'file_bytes': len(data),
+    }
+
+    with transaction.atomic():
+        # Rolled back below, unless the user was left behind by an older run
+        user, _ = User.objects.get_or_create(username='upload-benchmark', defaults={'password': make_password(None)})
+        group = Group.objects.create(name='Upload Benchmark')
+        UserProfile.objects.create(user=user, group=group, can_add=True)
+        path = reverse('survey:entry-upload')
+        view = resolve(path).func
+
+        def upload():
+            upload = SimpleUploadedFile(f'benchmark.{file_format}', data)
+            request = APIRequestFactory().post(path, {'file': upload}, format='multipart')
+            force_authenticate(request, user=user)
+            response = view(request)
+            return run_upload_job(UploadJob.objects.get(pk=response.data['id']))
+
+        with CaptureQueriesContext(connection) as queries:
+            job, seconds, peak = measure(upload)
+
+        result.update({
+            'status': job.status,
+            'error': job.error,
+            'births': job.inserted_count,
+            'seconds': round(seconds, 4),
+            'queries': len(queries),
+            'rows_per_second': round(job.inserted_count / seconds, 1) if seconds > 0 else None,
+            'peak_memory_bytes': peak,
+        })
+        transaction.set_rollback(True)
+
+    return result
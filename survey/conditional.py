@@ -0,0 +1,59 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from users.models import Group
+
+
+class NotModified(Exception):
+
+    def __init__(self, etag):
+        super().__init__(etag)
+        self.etag = etag
+
+
+def group_versions_etag(path, group_ids):
+    versions = list(
+        Group.objects.filter(pk__in=group_ids).order_by('pk').values_list('pk', 'data_version')
+    )
+    digest = hashlib.sha256(repr((path, versions)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+class GroupVersionETagMixin:
+    """
+    Tag GET responses with the data versions of the groups they cover and
+    answer a matching If-None-Match with 304 before the handler runs.
+    Views implement get_etag_group_ids().
+
+    Entries also show their author and all of their groups, so renaming a
+    user or group, or changing an entry's links, bumps every group holding
+    the affected entries (see survey.signals).
+    """
+    etag = None
+
+    def get_etag_group_ids(self):
+        raise NotImplementedError
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication and permission checks
+        super().initial(request, *args, **kwargs)
+        if request.method != 'GET':
+            return
+        # The full path keeps pages, cursors and date ranges apart
+        self.etag = group_versions_etag(request.get_full_path(), self.get_etag_group_ids())
+        if self.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            raise NotModified(self.etag)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': exc.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+        return response
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+from users.models import Group
+from .exports import EXPORT_FILES, iter_export, last_quarter_starts
+from .models import ExportJob
+
+READ_CHUNK_BYTES = 64 * 1024
+
+# Writers touch their .partial file with every chunk, so one left this long
+# belongs to a writer that has gone away
+PARTIAL_MAX_AGE = 60 * 60
+
+# Counted per process, like the membership cache
+CACHE_STATS = Counter()
+
+
+def export_cache_dir():
+    return Path(getattr(settings, 'EXPORT_CACHE_DIR', settings.BASE_DIR / 'export_cache'))
+
+
+def export_cache_key(export_format, group_ids, start=None, end=None):
+    """
+    Hash the format, date range and each group's data version, so any write
+    to the groups gives their exports a new key. Renaming a group or
+    changing an entry's links also bumps every group sharing those entries,
+    since each row lists all of its entry's groups.
+    """
+    versions = sorted(Group.objects.filter(pk__in=group_ids).values_list('pk', 'data_version'))
+    if export_format == ExportJob.QUARTERLY and start is None:
+        # The sheet covers the last reporting year, which rolls over each July
+        start = last_quarter_starts()[0]
+    parts = [export_format, start or '', end or ''] + [f'{pk}.{version}' for pk, version in versions]
+    return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+class CachedExport:
+    """
+    An export of the groups' data. A hit is read from the cached file; a
+    miss is generated as it is iterated, with every chunk also written to a
+    .partial file that becomes the cached copy once the last chunk is in.
+
+    rows is the number of entries exported, known on a hit and once a miss
+    has been iterated to the end. It is kept in the cached file's name.
+    """
+
+    def __init__(self, export_format, group_ids, start=None, end=None):
+        self.export_format = export_format
+        self.group_ids = group_ids
+        self.start = start
+        self.end = end
+        self._chunks = None
+        self.rows = None
+        self.file = None
+
+        self.directory = export_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename, _ = EXPORT_FILES[export_format]
+        self.key = export_cache_key(export_format, group_ids, start, end)
+        self.suffix = Path(filename).suffix
+
+        for path in self.directory.glob(f'{self.key}-*{self.suffix}'):
+            try:
+                self.file = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted since the glob
+                continue
+            self.rows = int(path.name[len(self.key) + 1:-len(self.suffix)])
+            # The modification time records the last use for LRU eviction
+            os.utime(path)
+            break
+        CACHE_STATS['hits' if self.file is not None else 'misses'] += 1
+
+    def __iter__(self):
+        self._chunks = self._read() if self.file is not None else self._generate()
+        return self._chunks
+
+    def close(self):
+        # Called by the response when the client goes away mid-download
+        if self._chunks is not None:
+            self._chunks.close()
+        if self.file is not None:
+            self.file.close()
+
+    def _read(self):
+        with self.file:
+            yield from iter(lambda: self.file.read(READ_CHUNK_BYTES), b'')
+
+    def _generate(self):
+        fd, partial = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+        finished = False
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                rows = yield from _written(
+                    iter_export(self.export_format, self.group_ids, self.start, self.end), output
+                )
+            # Readers only ever see a complete file
+            os.replace(partial, self.directory / f'{self.key}-{rows}{self.suffix}')
+            self.rows = rows
+            finished = True
+        finally:
+            if not finished:
+                Path(partial).unlink(missing_ok=True)
+        evict_exports()
+
+
+def _written(chunks, output):
+    # Passes the chunks on while writing them, returning the generator's result
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration as done:
+            return done.value
+        output.write(chunk)
+        yield chunk
+
+
+def export_response(export_format, group_ids, start=None, end=None):
+    """Serve a cached export as a file, or stream a new one while it is cached."""
+    export = CachedExport(export_format, group_ids, start, end)
+    filename, content_type = EXPORT_FILES[export_format]
+    if export.file is not None:
+        return FileResponse(export.file, as_attachment=True, filename=filename, content_type=content_type)
+
+    # The first chunks go out before the rest of the export has been generated
+    response = StreamingHttpResponse(export, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _cached_files():
+    files = []
+    for path in export_cache_dir().glob('*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    return files
+
+
+def evict_exports(max_bytes=None):
+    """
+    Delete the least recently used exports until the cache fits in
+    max_bytes, along with .partial files abandoned by crashed writers.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    stale = time.time() - PARTIAL_MAX_AGE
+    files = []
+    for mtime, size, path in _cached_files():
+        if path.suffix != '.partial':
+            files.append((mtime, size, path))
+        elif mtime < stale:
+            path.unlink(missing_ok=True)
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def export_cache_stats():
+    hits, misses = CACHE_STATS['hits'], CACHE_STATS['misses']
+    lookups = hits + misses
+    files = [(size, path) for _, size, path in _cached_files() if path.suffix != '.partial']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'files': len(files),
+        'bytes': sum(size for size, _ in files),
+    }
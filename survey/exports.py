@@ -0,0 +1,227 @@
+import io
+import zlib
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from .models import Entry, ExportJob
+from .reports import fiscal_quarter_label, fiscal_year_start, next_period, quarterly_counts
+from .scopes import entries_for_groups
+from .streaming import entry_chunks_csv, entry_chunks_ndjson, iter_entry_chunks
+
+try:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Download name and content type per export format
+EXPORT_FILES = {
+    ExportJob.CSV: ('survey_data.csv', 'text/csv'),
+    ExportJob.CSV_GZ: ('survey_data.csv.gz', 'application/gzip'),
+    ExportJob.NDJSON_GZ: ('survey_data.ndjson.gz', 'application/gzip'),
+    ExportJob.PARQUET: ('survey_data.parquet', 'application/vnd.apache.parquet'),
+    ExportJob.QUARTERLY: ('quarterly_survey_data.xlsx', XLSX_CONTENT_TYPE),
+}
+
+
+def available_formats(entries_only=False):
+    """Export formats this install can write; Parquet needs pyarrow."""
+    formats = list(EXPORT_FILES)
+    if pa is None:
+        formats.remove(ExportJob.PARQUET)
+    if entries_only:
+        formats.remove(ExportJob.QUARTERLY)
+    return formats
+
+
+def last_quarter_starts():
+    # The last complete July-June reporting year
+    start_year = fiscal_year_start(datetime.today().date()).year - 1
+    return [date(start_year + (month < 7), month, 1) for month in (7, 10, 1, 4)]
+
+
+def write_quarterly_xlsx(output, group_ids):
+    """
+    Write the quarterly sheet to output, filled from the groups' counts;
+    with no groups it is the blank template.
+    """
+    quarter_starts = last_quarter_starts()
+    quarters = [fiscal_quarter_label(start) for start in quarter_starts]
+    counts = {}
+    if group_ids:
+        end = next_period(quarter_starts[-1], 'quarter') - timedelta(days=1)
+        counts = quarterly_counts(group_ids, quarter_starts[0], end)
+
+    # Headers; quarter and "Final" titles span their two columns
+    headers = ["Group Robson"]
+    for quarter in quarters + ["Final"]:
+        headers.extend([quarter, None])
+    subheaders = [""] + ["Vaginal Delivery", "C/Section"] * (len(quarters) + 1)
+    rows = [headers, subheaders]
+
+    # Data rows
+    row_index = 3
+    for classification, group in Entry.CLASSIFICATIONS:
+        row = [group]
+        row.extend(
+            counts.get((start, classification, csection), 0)
+            for start in quarter_starts
+            for csection in (False, True)
+        )
+        # Add formulas for "Final" columns
+        vaginal_formula = f"=SUMPRODUCT(B{row_index}:I{row_index}, --ISEVEN(COLUMN(B{row_index}:I{row_index})))"
+        csection_formula = f"=SUMPRODUCT(B{row_index}:I{row_index}, --ISODD(COLUMN(B{row_index}:I{row_index})))"
+        row.extend([vaginal_formula, csection_formula])
+        rows.append(row)
+        row_index += 1
+
+    # Add "No Record" row
+    rows.append(["No Record"] + [0] * (len(quarters) * 2) + [f"=SUMPRODUCT(B14:I14, --ISEVEN(COLUMN(B14:I14)))", f"=SUMPRODUCT(B14:I14, --ISODD(COLUMN(B14:I14)))"])
+    row_index += 1
+
+    # Add "Total" row with dynamic column formulas
+    total_row = ["Total"]
+    for col in range(2, len(headers) + 1):
+        col_letter = get_column_letter(col)
+        total_row.append(f"=SUM({col_letter}3:{col_letter}{row_index - 1})")
+    rows.append(total_row)
+
+    # Write-only sheets stream rows to disk, so widths are set up front
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Quarterly Data")
+    for col in range(1, len(headers) + 1):
+        max_length = max(len(str(row[col - 1])) for row in rows if len(row) >= col and row[col - 1])
+        ws.column_dimensions[get_column_letter(col)].width = max_length + 2
+
+    ws.merged_cells.add("A1:A2")
+    for col in range(2, len(headers), 2):
+        ws.merged_cells.add(f"{get_column_letter(col)}1:{get_column_letter(col + 1)}1")
+
+    centered = Alignment(horizontal="center", vertical="center")
+    for row_number, row in enumerate(rows, start=1):
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(ws, value=value)
+            if row_number == 1:
+                cell.font = Font(bold=True)
+                cell.alignment = centered
+            elif row_number == 2:
+                cell.alignment = centered
+            elif row_number == len(rows):
+                cell.font = Font(bold=True)
+            cells.append(cell)
+        ws.append(cells)
+
+    wb.save(output)
+
+
+def export_entries(group_ids, start=None, end=None):
+    entries = entries_for_groups(group_ids)
+    if start:
+        entries = entries.filter(date__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        entries = entries.filter(date__lte=timezone.make_aware(datetime.combine(end, time.max)))
+    return entries
+
+
+def iter_entries_gzip(chunks):
+    # wbits=31 writes a gzip member; zlib leaves the header mtime at 0, so
+    # identical data gives identical bytes
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Drain(io.RawIOBase):
+    # A write-only sink whose bytes are handed on after each Parquet row group
+
+    def __init__(self):
+        super().__init__()
+        self.pending = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pending.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.pending)
+        self.pending = []
+        return data
+
+
+def iter_entries_parquet(chunks):
+    """Yield a Parquet file one row group per chunk of entries."""
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('classification', pa.string()),
+        ('user', pa.string()),
+        ('csection', pa.bool_()),
+        ('date', pa.timestamp('us', tz='UTC')),
+        ('groups', pa.list_(pa.string())),
+    ])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in chunks:
+        frame = pd.DataFrame(rows).rename(columns={'user__username': 'user'})
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        yield sink.drain()
+    # The footer is written on close
+    writer.close()
+    yield sink.drain()
+
+
+class _CountedChunks:
+    # Counts entries as their chunks pass through to a writer
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.rows = 0
+
+    def __iter__(self):
+        for rows in self.chunks:
+            self.rows += len(rows)
+            yield rows
+
+
+def iter_export(export_format, group_ids, start=None, end=None):
+    """
+    Yield an export of the groups' data as chunks of bytes, returning the
+    number of entries written (0 for the quarterly sheet).
+    """
+    if export_format == ExportJob.QUARTERLY:
+        # A fixed-size sheet; the zip container is built in one go
+        output = io.BytesIO()
+        write_quarterly_xlsx(output, group_ids)
+        yield output.getvalue()
+        return 0
+
+    chunks = _CountedChunks(iter_entry_chunks(export_entries(group_ids, start, end)))
+    if export_format == ExportJob.CSV_GZ:
+        yield from iter_entries_gzip(entry_chunks_csv(chunks))
+    elif export_format == ExportJob.NDJSON_GZ:
+        yield from iter_entries_gzip(entry_chunks_ndjson(chunks))
+    elif export_format == ExportJob.PARQUET:
+        yield from iter_entries_parquet(chunks)
+    else:
+        for chunk in entry_chunks_csv(chunks):
+            yield chunk.encode('utf-8')
+    return chunks.rows
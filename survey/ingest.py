@@ -0,0 +1,291 @@
+import codecs
+import csv
+import hashlib
+import os
+import re
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .models import Entry, EntryCount
+from .rollups import apply_rollup, rollup_key
+from users.memberships import Memberships
+
+BATCH_SIZE = 2000
+
+SHEET_EXTENSIONS = ('.csv', '.xlsx')
+
+VALID_CLASSIFICATIONS = {value for value, _ in Entry.CLASSIFICATIONS}
+
+
+def parse_quarter_label(label):
+    # "Quarter 1: 1st July 2023 - 30th September 2023" -> end of the quarter, capped at now
+    end = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', label.split("- ")[1].strip())
+    return timezone.make_aware(min(datetime.strptime(end, '%d %B %Y'), datetime.now()))
+
+
+def quarter_label_dates(label):
+    # "Quarter 1: 1st July 2023 - 30th September 2023" -> (2023-07-01, 2023-09-30), uncapped
+    start, end = label.split(':', 1)[1].split(' - ')
+    return tuple(
+        datetime.strptime(re.sub(r'(\d+)(st|nd|rd|th)', r'\1', part.strip()), '%d %B %Y').date()
+        for part in (start, end)
+    )
+
+
+def parse_quarterly_rows(rows):
+    """
+    Yield (classification, csection, date, count) cells from the rows of a
+    quarterly sheet laid out like GenerateQuarterlyXLSX.
+
+    Rows are consumed one at a time: the header row (first cell starting
+    with "group") gives the quarter columns, the row after it holds the
+    Vaginal/C-section subheaders and the "Group ..." rows follow.
+    """
+    rows = iter(rows)
+    for header in rows:
+        if header and str(header[0]).strip().lower().startswith("group"):
+            break
+    else:
+        raise ValueError('Invalid format')
+
+    periods = []
+    column = 1
+    while column < len(header) and _is_label(header[column], "Quarter"):
+        periods.append((column, parse_quarter_label(header[column])))
+        column += 2
+    if not periods:
+        raise ValueError('Invalid format')
+
+    next(rows, None)
+    found = False
+    for row in rows:
+        if not row or not _is_label(row[0], "Group"):
+            break
+        found = True
+        classification = row[0].split(' ')[1]
+        for column, date in periods:
+            for offset, csection in ((0, False), (1, True)):
+                # Blank cells count as zero so every quarter in the sheet is reported
+                count = _parse_count(row, column + offset) or 0
+                yield classification, csection, date, count
+    if not found:
+        raise ValueError('Invalid format')
+
+
+class HashingFile(File):
+    """Wraps an upload so that saving it to storage also computes its SHA-256."""
+
+    def __init__(self, file):
+        super().__init__(file, name=file.name)
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self.sha256.update(chunk)
+            yield chunk
+
+
+def iter_upload_rows(upload):
+    _, file_extension = os.path.splitext(upload.name)
+    if file_extension == '.csv':
+        return iter_csv_rows(upload)
+    if file_extension == '.xlsx':
+        return iter_xlsx_rows(upload)
+    raise ValueError('Invalid format')
+
+
+def iter_csv_rows(upload, encoding='utf-8-sig'):
+    # Parse the upload chunk by chunk as Django's upload handlers deliver it
+    return csv.reader(_iter_lines(upload, encoding))
+
+
+def iter_xlsx_rows(upload):
+    # One read-only pass over the active sheet; data_only returns cached formula values
+    workbook = load_workbook(upload, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_lines(upload, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in upload.chunks():
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _is_label(value, prefix):
+    return isinstance(value, str) and value[:len(prefix)] == prefix
+
+
+def _parse_count(row, column):
+    value = row[column] if column < len(row) else None
+    if value is None or value == '' or value != value:
+        return None
+    try:
+        count = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid count "{value}"')
+    if count < 0 or not count.is_integer():
+        raise ValueError(f'Invalid count "{value}"')
+    return int(count)
+
+
+def resolve_entry_groups(user):
+    # New entries are shared with every group their author may add to
+    return Memberships(user).addable_group_ids()
+
+
+def bulk_insert_entries(user, cells, group_ids, batch_size=BATCH_SIZE):
+    """
+    Expand (classification, csection, date, count) cells into Entry rows and
+    write them with batched inserts, linking every row to group_ids.
+
+    Everything runs in one transaction so a failed batch leaves no partial
+    data behind. Returns a dict with the new ids, count and throughput.
+    """
+    started = time.perf_counter()
+    ids = []
+    batch = []
+
+    with transaction.atomic():
+        for classification, csection, date, count in cells:
+            if classification not in VALID_CLASSIFICATIONS:
+                raise ValueError(f'Unknown Robson group "{classification}"')
+            for _ in range(count):
+                batch.append(Entry(
+                    classification=classification,
+                    csection=csection,
+                    date=date,
+                    user=user,
+                ))
+                if len(batch) >= batch_size:
+                    ids.extend(_flush_entries(batch, group_ids, batch_size))
+                    batch = []
+        if batch:
+            ids.extend(_flush_entries(batch, group_ids, batch_size))
+
+    stats = _ingest_stats(len(ids), time.perf_counter() - started)
+    stats['ids'] = ids
+    return stats
+
+
+def add_entry_counts(cells, group_ids, replace=False, batch_size=BATCH_SIZE):
+    """
+    Add (classification, csection, date, count) cells to the EntryCount
+    totals of every group in group_ids, one row per day.
+
+    With replace=True the sheet is treated as the authoritative report for
+    the quarters it covers: the groups' existing counts in those quarters
+    are deleted and the new ones inserted in the same transaction. A sheet
+    covering only part of a quarter still wipes the rest of that quarter,
+    so callers must pass only groups the user may add to
+    (Memberships.addable_group_ids()).
+
+    Cells are summed in memory first, so the number of queries depends on
+    the size of the count matrix rather than on the number of births.
+    """
+    started = time.perf_counter()
+    totals = Counter()
+    for classification, csection, day, count in cells:
+        if classification not in VALID_CLASSIFICATIONS:
+            raise ValueError(f'Unknown Robson group "{classification}"')
+        totals[(classification, csection, timezone.localdate(day))] += count
+    periods = {period for _, _, period in totals}
+
+    rollup = Counter()
+    with transaction.atomic():
+        existing = {}
+        if replace and periods:
+            quarters = Q()
+            for start, end in {quarter_bounds(period) for period in periods}:
+                quarters |= Q(period__range=(start, end))
+            replaced = EntryCount.objects.filter(quarters, group__in=group_ids)
+            for group_id, classification, csection, period, count in replaced.values_list(
+                    'group', 'classification', 'csection', 'period', 'count'):
+                rollup[(group_id, classification, csection, period)] -= count
+            replaced.delete()
+        elif not replace:
+            existing = {
+                (row.group_id, row.classification, row.csection, row.period): row
+                for row in EntryCount.objects.select_for_update().filter(
+                    group__in=group_ids,
+                    period__in=periods,
+                )
+            }
+
+        updated = []
+        created = []
+        for group_id in group_ids:
+            for (classification, csection, period), count in totals.items():
+                rollup[(group_id, classification, csection, period)] += count
+                row = existing.get((group_id, classification, csection, period))
+                if row is not None:
+                    row.count += count
+                    updated.append(row)
+                elif count:
+                    created.append(EntryCount(
+                        group_id=group_id,
+                        classification=classification,
+                        csection=csection,
+                        period=period,
+                        count=count,
+                    ))
+        EntryCount.objects.bulk_update(updated, ['count'], batch_size=batch_size)
+        EntryCount.objects.bulk_create(created, batch_size=batch_size)
+        apply_rollup(rollup)
+
+    return _ingest_stats(sum(totals.values()), time.perf_counter() - started)
+
+
+def replaced_quarters(cells, group_ids):
+    """Return the (group_id, quarter start) pairs add_entry_counts(cells, group_ids, replace=True) replaces."""
+    starts = {quarter_bounds(timezone.localdate(day))[0] for _, _, day, _ in cells}
+    return {(group_id, start) for group_id in group_ids for start in starts}
+
+
+def quarter_bounds(day):
+    # Reporting quarters (July-September, ...) line up with calendar quarters
+    start = date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    if start.month == 10:
+        next_start = date(start.year + 1, 1, 1)
+    else:
+        next_start = date(start.year, start.month + 3, 1)
+    return start, next_start - timedelta(days=1)
+
+
+def _flush_entries(batch, group_ids, batch_size):
+    created = Entry.objects.bulk_create(batch, batch_size=batch_size)
+    through = Entry.groups.through
+    links = [
+        through(entry_id=entry.pk, group_id=group_id)
+        for entry in created
+        for group_id in group_ids
+    ]
+    through.objects.bulk_create(links, batch_size=batch_size)
+    # bulk_create sends no signals, so the rollup is updated here
+    apply_rollup(Counter(rollup_key(group_id, entry) for entry in created for group_id in group_ids))
+    return [entry.pk for entry in created]
+
+
+def _ingest_stats(count, seconds):
+    return {
+        'count': count,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(count / seconds, 1) if seconds > 0 else None,
+    }
@@ -0,0 +1,236 @@
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .archives import ingest_archive
+from .export_cache import CachedExport
+from .exports import EXPORT_FILES
+from .ingest import add_entry_counts, iter_upload_rows, parse_quarterly_rows, replaced_quarters
+from .models import ExportJob, UploadJob
+from users.memberships import Memberships
+
+
+def fail_stale_jobs(model, now=None):
+    """
+    Fail jobs left running for longer than JOB_TIMEOUT_SECONDS by a worker
+    that stopped, and return how many there were. They are not retried, as
+    a job that crashed its worker would likely crash the next one too.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'JOB_TIMEOUT_SECONDS', 60 * 60))
+    stale = model.objects.filter(status=model.RUNNING, started_on__lt=cutoff)
+    for job in stale:
+        if model is UploadJob and job.upload:
+            job.upload.delete(save=False)
+        job.status = model.FAILED
+        job.error = 'The worker stopped before the job finished.'
+        job.finished_on = now
+        job.save()
+    return len(stale)
+
+
+def _claim_next(model):
+    """Mark the oldest queued job as running and return it, or None if the queue is empty."""
+    fail_stale_jobs(model)
+    with transaction.atomic():
+        # skip_locked lets several workers poll the same table without blocking each other
+        job = (
+            model.objects.select_for_update(skip_locked=True)
+            .filter(status=model.QUEUED)
+            .order_by('created_on', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = model.RUNNING
+        job.started_on = timezone.now()
+        job.save(update_fields=['status', 'started_on'])
+    return job
+
+
+def claim_next_upload_job():
+    return _claim_next(UploadJob)
+
+
+def claim_next_export_job():
+    return _claim_next(ExportJob)
+
+
+def find_duplicate_upload(fingerprint, group_ids):
+    """
+    Return the earlier job that uploaded the same file for exactly these
+    groups, unless a job since has replaced any of the (group, quarter)
+    pairs it set, in which case uploading the file again would restore them.
+    """
+    group_ids = set(group_ids)
+    earlier = (
+        UploadJob.objects.filter(fingerprint=fingerprint)
+        .exclude(status=UploadJob.FAILED)
+        .prefetch_related('groups')
+        .order_by('-pk')
+    )
+    job = next((job for job in earlier if {group.pk for group in job.groups.all()} == group_ids), None)
+    if job is None:
+        return None
+
+    quarters = {tuple(pair) for pair in job.quarters}
+    later = (
+        UploadJob.objects.filter(pk__gt=job.pk, groups__in=group_ids)
+        .exclude(status=UploadJob.FAILED)
+        .values_list('quarters', flat=True)
+    )
+    for pairs in later:
+        # Jobs that have not run yet may replace anything
+        if not quarters or not pairs or quarters & {tuple(pair) for pair in pairs}:
+            return None
+    return job
+
+
+def _quarter_pairs(replaced):
+    return sorted([group_id, start.isoformat()] for group_id, start in replaced)
+
+
+def run_upload_job(job):
+    try:
+        # Read back from storage a chunk at a time, never as one bytes object
+        with job.upload.open('rb') as upload:
+            if job.filename.endswith('.zip'):
+                _run_archive(job, upload)
+            else:
+                _run_sheet(job, upload)
+        job.status = UploadJob.DONE
+    except Exception as e:
+        job.status = UploadJob.FAILED
+        job.error = str(e)
+
+    # The stored upload is only needed until it has been ingested
+    if job.upload:
+        job.upload.delete(save=False)
+    job.finished_on = timezone.now()
+    job.save()
+    return job
+
+
+def _addable_job_group_ids(job):
+    # Checked again here since rights may have changed while the job was queued
+    addable = set(Memberships(job.user).addable_group_ids())
+    group_ids = [pk for pk in job.groups.values_list('pk', flat=True) if pk in addable]
+    if not group_ids:
+        raise PermissionError('You no longer have permission to add data to these groups.')
+    return group_ids
+
+
+def _run_sheet(job, upload):
+    # Cells are one per (group, mode, quarter), so holding them is cheap
+    cells = list(parse_quarterly_rows(iter_upload_rows(upload)))
+    job.parsed_count = sum(count for _, _, _, count in cells)
+    job.save(update_fields=['parsed_count'])
+
+    group_ids = _addable_job_group_ids(job)
+    # A re-upload replaces whatever the groups previously reported for those quarters
+    stats = add_entry_counts(cells, group_ids, replace=True)
+    job.quarters = _quarter_pairs(replaced_quarters(cells, group_ids))
+    job.inserted_count = stats['count']
+    job.rows_per_second = stats['rows_per_second']
+
+
+def _run_archive(job, upload):
+    started = time.perf_counter()
+    group_ids = _addable_job_group_ids(job)
+    job.report, replaced = ingest_archive(upload, group_ids)
+    job.quarters = _quarter_pairs(replaced)
+
+    job.inserted_count = sum(summary['count'] for summary in job.report)
+    job.parsed_count = job.inserted_count
+    seconds = time.perf_counter() - started
+    job.rows_per_second = round(job.inserted_count / seconds, 1) if seconds > 0 else None
+    failed = [summary['file'] for summary in job.report if summary['status'] == 'failed']
+    if failed:
+        job.error = f'{len(failed)} of {len(job.report)} files failed.'
+
+
+def _viewable_job_group_ids(job):
+    # Memberships may have been revoked while the job was queued
+    group_ids = list(job.groups.values_list('pk', flat=True))
+    if not group_ids:
+        # A blank quarterly template
+        return []
+    viewable = set(Memberships(job.user).viewable_group_ids())
+    group_ids = [pk for pk in group_ids if pk in viewable]
+    if not group_ids:
+        raise PermissionError('You no longer have permission to view these groups.')
+    return group_ids
+
+
+def queue_export_job(user, export_format, group_ids, start_date=None, end_date=None, email=''):
+    job = ExportJob.objects.create(
+        user=user, format=export_format, start_date=start_date, end_date=end_date, email=email or ''
+    )
+    job.groups.set(group_ids)
+    return job
+
+
+def run_export_job(job):
+    filename, _ = EXPORT_FILES[job.format]
+    try:
+        group_ids = _viewable_job_group_ids(job)
+        # Repeated exports of unchanged groups are copied from the export cache
+        export = CachedExport(job.format, group_ids, job.start_date, job.end_date)
+        with tempfile.TemporaryFile() as output:
+            for chunk in export:
+                output.write(chunk)
+            output.seek(0)
+            job.file.save(f'{job.pk}-{filename}', File(output), save=False)
+        # Counted as the export was written, or read from the cached copy
+        job.row_count = export.rows
+        job.status = ExportJob.DONE
+    except Exception as e:
+        job.status = ExportJob.FAILED
+        job.error = str(e)
+
+    job.finished_on = timezone.now()
+    job.save()
+
+    if job.status == ExportJob.DONE and job.email:
+        _email_export(job)
+    return job
+
+
+def expire_export_jobs(now=None):
+    """
+    Delete export jobs finished more than EXPORT_JOB_RETENTION_DAYS ago,
+    along with their files, and return how many were deleted.
+    """
+    days = getattr(settings, 'EXPORT_JOB_RETENTION_DAYS', 7)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    expired = 0
+    for job in ExportJob.objects.filter(finished_on__lt=cutoff).iterator():
+        # The row alone would leave the file behind in MEDIA_ROOT
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        expired += 1
+    return expired
+
+
+def _email_export(job):
+    filename, content_type = EXPORT_FILES[job.format]
+    try:
+        email = EmailMessage(
+            subject='Survey Data Export',
+            body='Please see the attached survey data.',
+            to=[job.email]
+        )
+        with job.file.open('rb') as export:
+            email.attach(filename, export.read(), content_type)
+        email.send()
+    except Exception as e:
+        # The file is still downloadable, so the job stays done
+        job.error = f'Email failed: {e}'
+        job.save(update_fields=['error'])
@@ -0,0 +1,48 @@
+import json
+import platform
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from survey.benchmarks import SYNTHETIC_FILES, benchmark_upload, synthetic_quarters
+
+
+class Command(BaseCommand):
+    help = 'Time synthetic quarterly sheets through the upload endpoint and worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--births', type=int, nargs='+', default=[1, 100, 1000, 10000, 50000],
+                            help='Births per count cell for each run')
+        parser.add_argument('--formats', nargs='+', choices=sorted(SYNTHETIC_FILES), default=['csv', 'xlsx'])
+        parser.add_argument('--years', type=int, default=1,
+                            help='Fiscal years of quarters in every sheet')
+        parser.add_argument('--output', default='upload_benchmark.json',
+                            help='File the JSON results are written to')
+
+    def handle(self, *args, **options):
+        quarters = synthetic_quarters(options['years'])
+        results = []
+
+        self.stdout.write(
+            f"{'format':>6} {'births/cell':>11} {'births':>10} {'seconds':>9} "
+            f"{'queries':>7} {'births/s':>12} {'peak KiB':>10}"
+        )
+        for file_format in options['formats']:
+            for births in options['births']:
+                result = benchmark_upload(file_format, quarters, births)
+                results.append(result)
+                self.stdout.write(
+                    f"{file_format:>6} {births:>11} {result['births']:>10} {result['seconds']:>9.3f} "
+                    f"{result['queries']:>7} {result['rows_per_second'] or 0:>12.0f} "
+                    f"{result['peak_memory_bytes'] / 1024:>10.1f}"
+                )
+
+        with open(options['output'], 'w') as output:
+            json.dump({
+                'created_on': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'results': results,
+            }, output, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.benchmarks import (
+    legacy_xlsx_cells, measure, streaming_xlsx_cells, synthetic_quarters, synthetic_xlsx
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare parse time and peak memory of the streaming .xlsx reader against the old pandas path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, nargs='+', default=[1, 10, 50],
+                            help='Workbook sizes to generate, in fiscal years of quarters')
+        parser.add_argument('--births', type=int, default=1000,
+                            help='Births in every count cell')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'years':>6} {'size':>10} {'parser':>10} {'seconds':>9} {'peak KiB':>10}")
+
+        for years in options['years']:
+            data = synthetic_xlsx(synthetic_quarters(years), options['births'])
+
+            results = {}
+            for name, parser in (('pandas', legacy_xlsx_cells), ('streaming', streaming_xlsx_cells)):
+                cells, seconds, peak = measure(parser, data)
+                results[name] = cells
+                self.stdout.write(
+                    f"{years:>6} {len(data):>10} {name:>10} {seconds:>9.3f} {peak / 1024:>10.1f}"
+                )
+
+            if results['pandas'] != results['streaming']:
+                raise CommandError(f'Parsers disagree on the {years} year workbook')
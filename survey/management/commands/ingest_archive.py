@@ -0,0 +1,47 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.archives import ingest_archive
+from survey.ingest import resolve_entry_groups
+
+
+class Command(BaseCommand):
+    help = 'Ingest a zip of quarterly hospital spreadsheets, parsing the files in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Zip archive of .csv/.xlsx quarterly sheets named after their groups')
+        parser.add_argument('--user', required=True,
+                            help='Username of the coordinator the sheets are uploaded as')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Parser processes (defaults to UPLOAD_ARCHIVE_WORKERS or up to 4)')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the per-file report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" not found')
+
+        group_ids = resolve_entry_groups(user)
+        if not group_ids:
+            raise CommandError(f'User "{user.username}" cannot add data to any group')
+
+        with open(options['path'], 'rb') as archive:
+            report, _ = ingest_archive(archive.read(), group_ids, options['workers'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for summary in report:
+            self.stdout.write(
+                f"{summary['status']:<8} {summary['file']:<40} {summary['group'] or '-':<30} "
+                f"{summary['count']:>8} {summary['error']}"
+            )
+        done = [summary for summary in report if summary['status'] == 'done']
+        self.stdout.write(
+            f"{len(done)} of {len(report)} files ingested, {sum(s['count'] for s in done)} births"
+        )
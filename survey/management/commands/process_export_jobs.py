@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.jobs import claim_next_export_job, expire_export_jobs, run_export_job
+
+# Seconds between sweeps for expired export files while polling
+EXPIRY_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Build queued survey exports from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        last_expiry = None
+        while True:
+            job = claim_next_export_job()
+            if job is None:
+                if last_expiry is None or time.monotonic() - last_expiry >= EXPIRY_INTERVAL:
+                    self._expire()
+                    last_expiry = time.monotonic()
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            run_export_job(job)
+            self.stdout.write(f'Export job {job.pk} {job.status}: {job.row_count} entries')
+
+    def _expire(self):
+        expired = expire_export_jobs()
+        if expired:
+            self.stdout.write(f'Deleted {expired} expired export jobs')
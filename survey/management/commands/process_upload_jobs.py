@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.jobs import claim_next_upload_job, run_upload_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued spreadsheet uploads from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_upload_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            run_upload_job(job)
+            self.stdout.write(
+                f'Upload job {job.pk} {job.status}: {job.inserted_count} of {job.parsed_count} entries'
+            )
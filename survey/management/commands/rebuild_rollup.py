@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from survey.rollups import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the daily EntryRollup table from entries and uploaded counts'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollup()
+        self.stdout.write(f'Rebuilt entry rollup: {rows} rows')
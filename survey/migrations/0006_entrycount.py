@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_uploadjob'),
+        ('users', '0008_merge_20240929_2048'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classification', models.CharField(choices=[('1', 'Group 1'), ('2', 'Group 2'), ('3', 'Group 3'), ('4', 'Group 4'), ('5.1', 'Group 5.1'), ('5.2', 'Group 5.2'), ('6', 'Group 6'), ('7', 'Group 7'), ('8', 'Group 8'), ('9', 'Group 9'), ('10', 'Group 10')], max_length=100)),
+                ('csection', models.BooleanField(default=False)),
+                ('period', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entry_counts', to='users.group')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'classification', 'csection', 'period'), name='unique_entry_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_uploadjob_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='report',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
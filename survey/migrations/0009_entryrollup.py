@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:40
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    Entry = apps.get_model('survey', 'Entry')
+    EntryCount = apps.get_model('survey', 'EntryCount')
+    EntryRollup = apps.get_model('survey', 'EntryRollup')
+
+    totals = Counter()
+    entry_days = Entry.groups.through.objects.annotate(
+        day=TruncDate('entry__date'),
+    ).values('group', 'entry__classification', 'entry__csection', 'day').annotate(
+        births=Count('pk'),
+    ).order_by()
+    for row in entry_days:
+        totals[(row['group'], row['entry__classification'], row['entry__csection'], row['day'])] += row['births']
+    for group_id, classification, csection, period, count in EntryCount.objects.values_list(
+            'group', 'classification', 'csection', 'period', 'count'):
+        totals[(group_id, classification, csection, period)] += count
+
+    EntryRollup.objects.bulk_create([
+        EntryRollup(group_id=group_id, classification=classification, csection=csection, day=day, count=count)
+        for (group_id, classification, csection, day), count in totals.items()
+        if count
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0008_uploadjob_report'),
+        ('users', '0008_merge_20240929_2048'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classification', models.CharField(choices=[('1', 'Group 1'), ('2', 'Group 2'), ('3', 'Group 3'), ('4', 'Group 4'), ('5.1', 'Group 5.1'), ('5.2', 'Group 5.2'), ('6', 'Group 6'), ('7', 'Group 7'), ('8', 'Group 8'), ('9', 'Group 9'), ('10', 'Group 10')], max_length=100)),
+                ('csection', models.BooleanField(default=False)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='users.group')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'classification', 'csection', 'day'), name='unique_entry_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:42
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_entryrollup'),
+        ('users', '0009_group_users_group_name_lower_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['date', 'id'], name='survey_entry_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filter',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='survey_filter_name_lower_idx'),
+        ),
+        # The auto-created through table only has (entry_id, group_id) unique
+        # and single-column FK indexes; group filters want group_id first
+        migrations.RunSQL(
+            'CREATE INDEX survey_entry_groups_group_entry_idx ON survey_entry_groups (group_id, entry_id)',
+            'DROP INDEX survey_entry_groups_group_entry_idx',
+        ),
+    ]
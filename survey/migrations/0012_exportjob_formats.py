@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0011_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='format',
+            field=models.CharField(choices=[('csv', 'Entries CSV'), ('csv.gz', 'Entries CSV, gzipped'), ('ndjson.gz', 'Entries NDJSON, gzipped'), ('parquet', 'Entries Parquet'), ('quarterly', 'Quarterly XLSX')], default='csv', max_length=20),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0012_exportjob_formats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadjob',
+            name='payload',
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='upload',
+            field=models.FileField(blank=True, upload_to='uploads/'),
+        ),
+    ]
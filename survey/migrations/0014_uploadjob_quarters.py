@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0013_uploadjob_upload_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='quarters',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 from users.models import Group, User
@@ -41,6 +42,10 @@ class Entry(models.Model):
 
     class Meta:
         verbose_name_plural = "Entries"
+        indexes = [
+            # Date filters and keyset pagination order by (date, id)
+            models.Index(fields=['date', 'id'], name='survey_entry_date_id_idx'),
+        ]
 
 
 class Filter(models.Model):
@@ -61,5 +66,212 @@ class Filter(models.Model):
         group_names = ', '.join([group.name for group in self.groups.all()])
         return f'{self.user.username} - Groups: {group_names} {self.pk}'
 
+    class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='survey_filter_name_lower_idx'),
+        ]
+
+
+class UploadJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='upload_jobs',
+    )
+    groups = models.ManyToManyField(
+        to=Group,
+        related_name='upload_jobs',
+        blank=True,
+    )
+    filename = models.CharField(
+        max_length=255,
+    )
+    # The raw upload, kept in default storage until the worker has ingested it
+    upload = models.FileField(
+        upload_to='uploads/',
+        blank=True,
+    )
+    # SHA-256 of the upload, used to turn away re-uploads of an identical file
+    fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
+    status = models.CharField(
+        choices=STATUSES,
+        default=QUEUED,
+        max_length=20,
+    )
+    parsed_count = models.PositiveIntegerField(default=0)
+    inserted_count = models.PositiveIntegerField(default=0)
+    rows_per_second = models.FloatField(
+        null=True,
+        blank=True,
+    )
+    error = models.TextField(blank=True)
+    # Per-file summary for zip archives
+    report = models.JSONField(
+        default=list,
+        blank=True,
+    )
+    # [group id, quarter start] pairs the job replaced, to tell whether a
+    # later upload of the same file would still change anything
+    quarters = models.JSONField(
+        default=list,
+        blank=True,
+    )
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    finished_on = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+
+    def __str__(self):
+        return f'{self.pk} {self.filename} ({self.status})'
+
+
+class EntryCount(models.Model):
+    # Aggregated births for one group, Robson group, delivery mode and period
+    group = models.ForeignKey(
+        to=Group,
+        on_delete=models.CASCADE,
+        related_name='entry_counts',
+    )
+    classification = models.CharField(
+        choices=Entry.CLASSIFICATIONS,
+        max_length=100,
+    )
+    csection = models.BooleanField(
+        default=False,
+    )
+    period = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.group} {self.classification} {self.period}: {self.count}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'classification', 'csection', 'period'],
+                name='unique_entry_count',
+            ),
+        ]
+
+
+class EntryRollup(models.Model):
+    # Births per group, Robson group, delivery mode and day across both
+    # individual entries and uploaded counts; maintained by survey.rollups
+    group = models.ForeignKey(
+        to=Group,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+    )
+    classification = models.CharField(
+        choices=Entry.CLASSIFICATIONS,
+        max_length=100,
+    )
+    csection = models.BooleanField(
+        default=False,
+    )
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
 
+    def __str__(self):
+        return f'{self.group} {self.classification} {self.day}: {self.count}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'classification', 'csection', 'day'],
+                name='unique_entry_rollup',
+            ),
+        ]
+
+
+class ExportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    CSV = 'csv'
+    CSV_GZ = 'csv.gz'
+    NDJSON_GZ = 'ndjson.gz'
+    PARQUET = 'parquet'
+    QUARTERLY = 'quarterly'
+    FORMATS = [
+        (CSV, 'Entries CSV'),
+        (CSV_GZ, 'Entries CSV, gzipped'),
+        (NDJSON_GZ, 'Entries NDJSON, gzipped'),
+        (PARQUET, 'Entries Parquet'),
+        (QUARTERLY, 'Quarterly XLSX'),
+    ]
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+    )
+    # Resolved when the export is requested, so the worker needs no request
+    groups = models.ManyToManyField(
+        to=Group,
+        related_name='export_jobs',
+        blank=True,
+    )
+    format = models.CharField(
+        choices=FORMATS,
+        default=CSV,
+        max_length=20,
+    )
+    start_date = models.DateField(
+        null=True,
+        blank=True,
+    )
+    end_date = models.DateField(
+        null=True,
+        blank=True,
+    )
+    # Sent the finished file by the worker when set
+    email = models.EmailField(blank=True)
+    status = models.CharField(
+        choices=STATUSES,
+        default=QUEUED,
+        max_length=20,
+    )
+    file = models.FileField(
+        upload_to='exports/',
+        blank=True,
+    )
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    finished_on = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
 
+    def __str__(self):
+        return f'{self.pk} {self.format} ({self.status})'
@@ -0,0 +1,78 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EntryKeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (date, id). Each page continues strictly
+    after the last row of the previous one, so deep pages cost the same
+    as the first.
+
+    Pagination is opt-in through ?cursor= or ?page_size= so clients that
+    expect a plain list keep working.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('date', 'id')
+
+        cursor = self.decode_cursor(params.get(self.cursor_query_param))
+        if cursor is not None:
+            date, pk = cursor
+            queryset = queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, entry):
+        return urlsafe_b64encode(f'{entry.date.isoformat()}|{entry.pk}'.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            date, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            date = parse_datetime(date)
+            if date is None:
+                raise ValueError
+            return date, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from .models import Entry
-from users.models import UserProfile
+from users.memberships import get_memberships
 
 
 class CanReadEntry(permissions.BasePermission):
@@ -9,11 +9,8 @@ class CanReadEntry(permissions.BasePermission):
         
         pk = view.kwargs.get('pk')
         
-        try:
-            entry = Entry.objects.get(pk=pk)
-            user_profile = UserProfile.objects.get(user=request.user, group=entry.group)
-            return user_profile.can_view | user_profile.is_admin
-        except Entry.DoesNotExist:
-            return False
-        except UserProfile.DoesNotExist:
-            return False
\ No newline at end of file
+        # Readable when any of the entry's groups is viewable by the user
+        return Entry.groups.through.objects.filter(
+            entry_id=pk,
+            group__in=get_memberships(request).viewable_group_ids(),
+        ).exists()
@@ -0,0 +1,260 @@
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncWeek
+from django.utils.dateparse import parse_date
+
+from .models import Entry, EntryRollup
+from users.models import Group
+
+GRANULARITIES = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+
+# Dense series are zero-filled, so their length is capped rather than the data
+MAX_SERIES_PERIODS = 260
+
+# The reporting year starts in July, so its quarters are calendar quarters
+# numbered from July
+FISCAL_QUARTER_LABELS = {
+    7: "Quarter 1: 1st July {0} - 30th September {0}",
+    10: "Quarter 2: 1st October {0} - 31st December {0}",
+    1: "Quarter 3: 1st January {0} - 31st March {0}",
+    4: "Quarter 4: 1st April {0} - 30th June {0}",
+}
+
+
+def parse_date_range(params):
+    """Read ?start_date= and ?end_date= (YYYY-MM-DD); either may be omitted."""
+    dates = []
+    for name in ('start_date', 'end_date'):
+        value = params.get(name)
+        parsed = parse_date(value) if value else None
+        if value and parsed is None:
+            raise ValueError(f'Invalid {name}')
+        dates.append(parsed)
+    return tuple(dates)
+
+
+def classification_counts(group_ids, start=None, end=None):
+    """
+    Return {classification: (births, csections)} for the groups from the
+    daily rollup, which covers both individual entries and uploaded counts.
+    """
+    rows = _rollups(group_ids, start, end).values('classification').annotate(
+        births=Sum('count'),
+        csections=Sum('count', filter=Q(csection=True)),
+    ).order_by()
+    return {row['classification']: (row['births'], row['csections'] or 0) for row in rows}
+
+
+def _rollups(group_ids, start, end):
+    rollups = EntryRollup.objects.filter(group__in=group_ids)
+    if start:
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        rollups = rollups.filter(day__lte=end)
+    return rollups
+
+
+def quarterly_counts(group_ids, start, end):
+    """Return {(quarter start, classification, csection): births} for the groups in one query."""
+    rows = _rollups(group_ids, start, end).annotate(
+        period=TruncQuarter('day'),
+    ).values('period', 'classification', 'csection').annotate(
+        births=Sum('count'),
+    ).order_by()
+    return {(row['period'], row['classification'], row['csection']): row['births'] for row in rows}
+
+
+def fiscal_year_start(day):
+    return date(day.year if day.month >= 7 else day.year - 1, 7, 1)
+
+
+def fiscal_quarter_label(start):
+    return FISCAL_QUARTER_LABELS[start.month].format(start.year)
+
+
+def period_start(day, granularity):
+    """Truncate a date the same way the database buckets it."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    months = 1 if granularity == 'month' else 3
+    month = start.month - 1 + months
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def period_label(start, granularity):
+    if granularity == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    if granularity == 'month':
+        return start.strftime('%Y-%m')
+    return fiscal_quarter_label(start)
+
+
+def classification_series(group_ids, granularity, start=None, end=None):
+    """
+    Bucket the groups' births by week, month or fiscal quarter in the
+    database and return a dense list of periods from start to end (or the
+    first to the last period with data), with empty periods zero-filled.
+
+    Raises ValueError when that would be more than MAX_SERIES_PERIODS periods.
+    """
+    if start and end:
+        # Refused before querying when the range alone is too long
+        _check_series_span(start, end, granularity)
+    buckets = _rollups(group_ids, start, end).annotate(
+        period=GRANULARITIES[granularity]('day'),
+    ).values('period', 'classification').annotate(
+        births=Sum('count'),
+        csections=Sum('count', filter=Q(csection=True)),
+    ).order_by()
+
+    counts = {}
+    for row in buckets:
+        counts.setdefault(row['period'], {})[row['classification']] = (row['births'], row['csections'] or 0)
+    if not counts and not (start and end):
+        return []
+
+    first = period_start(start or min(counts), granularity)
+    last = period_start(end or max(counts), granularity)
+    _check_series_span(first, last, granularity)
+    series = []
+    while first <= last:
+        period_counts = counts.get(first, {})
+        births = sum(total for total, _ in period_counts.values())
+        csections = sum(cs for _, cs in period_counts.values())
+        series.append({
+            'period': first,
+            'label': period_label(first, granularity),
+            'births': births,
+            'csections': csections,
+            'csection_rate': _percent(csections, births),
+            'classifications': {
+                classification: dict(zip(('births', 'csections'), period_counts.get(classification, (0, 0))))
+                for classification, _ in Entry.CLASSIFICATIONS
+            },
+        })
+        first = next_period(first, granularity)
+    return series
+
+
+def _check_series_span(start, end, granularity):
+    first, last = period_start(start, granularity), period_start(end, granularity)
+    if granularity == 'week':
+        periods = (last - first).days // 7 + 1
+    else:
+        months = (last.year - first.year) * 12 + last.month - first.month
+        periods = months // (3 if granularity == 'quarter' else 1) + 1
+    if periods > MAX_SERIES_PERIODS:
+        raise ValueError(
+            f'A {granularity}ly series is limited to {MAX_SERIES_PERIODS} periods; narrow start_date and end_date.'
+        )
+
+
+def robson_table(counts):
+    """
+    Build the Robson classification table from {classification: (births, csections)}:
+    group size, C-section rate and absolute/relative contribution, all in percent.
+    """
+    births = sum(total for total, _ in counts.values())
+    csections = sum(cs for _, cs in counts.values())
+
+    rows = []
+    for classification, label in Entry.CLASSIFICATIONS:
+        group_births, group_csections = counts.get(classification, (0, 0))
+        rows.append({
+            'classification': classification,
+            'label': label,
+            'births': group_births,
+            'csections': group_csections,
+            'group_size': _percent(group_births, births),
+            'csection_rate': _percent(group_csections, group_births),
+            'absolute_contribution': _percent(group_csections, births),
+            'relative_contribution': _percent(group_csections, csections),
+        })
+
+    return {
+        'births': births,
+        'csections': csections,
+        'csection_rate': _percent(csections, births),
+        'rows': rows,
+    }
+
+
+def group_classification_counts(group_ids, start=None, end=None):
+    """
+    Return [(group_id, name, {classification: (births, csections)})] for the
+    groups in one grouped query; groups without births get an empty dict.
+    """
+    in_range = Q()
+    if start:
+        in_range &= Q(rollups__day__gte=start)
+    if end:
+        in_range &= Q(rollups__day__lte=end)
+
+    # Grouping from Group keeps hospitals that have no births in the range
+    rows = Group.objects.filter(pk__in=group_ids).values(
+        'pk', 'name', 'rollups__classification', 'rollups__csection',
+    ).annotate(
+        births=Sum('rollups__count', filter=in_range),
+    ).order_by('name', 'pk')
+
+    groups = {}
+    for row in rows:
+        _, _, counts = groups.setdefault(row['pk'], (row['pk'], row['name'], {}))
+        if not row['births']:
+            continue
+        births, csections = counts.get(row['rollups__classification'], (0, 0))
+        if row['rollups__csection']:
+            csections += row['births']
+        counts[row['rollups__classification']] = (births + row['births'], csections)
+    return list(groups.values())
+
+
+def compare_groups(group_counts):
+    """
+    Build a Robson table per group plus the network table over all of them.
+    Each group's figures carry their deviation from the network in
+    percentage points.
+    """
+    totals = {}
+    for _, _, counts in group_counts:
+        for classification, (births, csections) in counts.items():
+            total_births, total_csections = totals.get(classification, (0, 0))
+            totals[classification] = (total_births + births, total_csections + csections)
+    network = robson_table(totals)
+    network_rows = {row['classification']: row for row in network['rows']}
+
+    hospitals = []
+    for group_id, name, counts in group_counts:
+        table = robson_table(counts)
+        table['csection_rate_deviation'] = _deviation(table['csection_rate'], network['csection_rate'])
+        for row in table['rows']:
+            network_row = network_rows[row['classification']]
+            for field in ('group_size', 'csection_rate', 'absolute_contribution'):
+                row[f'{field}_deviation'] = _deviation(row[field], network_row[field])
+        hospitals.append({'group': group_id, 'name': name, **table})
+
+    return {'network': network, 'hospitals': hospitals}
+
+
+def _deviation(value, baseline):
+    if value is None or baseline is None:
+        return None
+    return round(value - baseline, 2)
+
+
+def _percent(part, whole):
+    return round(100 * part / whole, 2) if whole else None
@@ -0,0 +1,94 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Entry, EntryCount, EntryRollup
+from users.models import Group
+
+BATCH_SIZE = 2000
+
+
+def rollup_key(group_id, entry):
+    return group_id, entry.classification, entry.csection, timezone.localdate(entry.date)
+
+
+def apply_rollup(deltas):
+    """
+    Add {(group_id, classification, csection, day): delta} to EntryRollup,
+    creating missing rows and dropping rows that fall to zero. Every change
+    to a group's births passes through here, so it also bumps the groups'
+    data versions.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # A failure should roll back the caller's write as well, so no savepoint
+    with transaction.atomic(savepoint=False):
+        existing = {
+            (row.group_id, row.classification, row.csection, row.day): row
+            for row in EntryRollup.objects.select_for_update().filter(
+                group__in={key[0] for key in deltas},
+                day__in={key[3] for key in deltas},
+            )
+        }
+        updated = []
+        created = []
+        emptied = []
+        for key, delta in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                if delta > 0:
+                    group_id, classification, csection, day = key
+                    created.append(EntryRollup(
+                        group_id=group_id,
+                        classification=classification,
+                        csection=csection,
+                        day=day,
+                        count=delta,
+                    ))
+            elif row.count + delta > 0:
+                row.count += delta
+                updated.append(row)
+            else:
+                emptied.append(row.pk)
+
+        EntryRollup.objects.bulk_update(updated, ['count'], batch_size=BATCH_SIZE)
+        EntryRollup.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if emptied:
+            EntryRollup.objects.filter(pk__in=emptied).delete()
+        Group.bump_data_version({key[0] for key in deltas})
+
+
+def rollup_totals():
+    """Recount the rollup from scratch out of Entry and EntryCount."""
+    totals = Counter()
+    entry_days = Entry.groups.through.objects.annotate(
+        day=TruncDate('entry__date'),
+    ).values('group', 'entry__classification', 'entry__csection', 'day').annotate(
+        births=Count('pk'),
+    ).order_by()
+    for row in entry_days:
+        key = (row['group'], row['entry__classification'], row['entry__csection'], row['day'])
+        totals[key] += row['births']
+
+    counts = EntryCount.objects.values_list('group', 'classification', 'csection', 'period', 'count')
+    for group_id, classification, csection, period, count in counts:
+        totals[(group_id, classification, csection, period)] += count
+    return totals
+
+
+def rebuild_rollup():
+    rows = [
+        EntryRollup(group_id=group_id, classification=classification, csection=csection, day=day, count=count)
+        for (group_id, classification, csection, day), count in rollup_totals().items()
+        if count
+    ]
+    with transaction.atomic():
+        EntryRollup.objects.all().delete()
+        EntryRollup.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        Group.bump_data_version(Group.objects.values('pk'))
+    return len(rows)
@@ -0,0 +1,58 @@
+from django.core.exceptions import PermissionDenied
+
+from .models import Entry, Filter
+from users.memberships import get_memberships
+
+
+def viewable_group_ids(request):
+    return get_memberships(request).viewable_group_ids()
+
+
+def scope_group_ids(request, pk):
+    """
+    Resolve a 'group-<id>' or 'filter-<id>' scope to the ids of the groups
+    in it that the user may view.
+    """
+    if pk.startswith('filter-'):
+        filter_id = pk.split('-')[1]
+        try:
+            user_filter = Filter.objects.get(pk=filter_id, user=request.user)
+        except (Filter.DoesNotExist, ValueError):
+            return []
+        groups_in_filter = user_filter.groups.filter(id__in=viewable_group_ids(request))
+        return list(groups_in_filter.values_list('id', flat=True))
+
+    elif pk.startswith('group-'):
+        group_id = pk.split('-')[1]
+        if not group_id.isdigit() or not get_memberships(request).can_view(group_id):
+            raise PermissionDenied("You do not have permission to view entries for this group.")
+        return [int(group_id)]
+
+    return []
+
+
+def params_group_ids(request, params=None):
+    """Resolve ?group=<id> or ?filter=<id>, defaulting to every group the user may view."""
+    if params is None:
+        params = request.query_params
+    if params.get('group'):
+        return scope_group_ids(request, f"group-{params['group']}")
+    if params.get('filter'):
+        return scope_group_ids(request, f"filter-{params['filter']}")
+    return viewable_group_ids(request)
+
+
+def quarterly_group_ids(request, params=None):
+    # The quarterly sheet is a blank template unless ?group= or ?filter= names groups to fill it from
+    if params is None:
+        params = request.query_params
+    if params.get('group') or params.get('filter'):
+        return params_group_ids(request, params)
+    return []
+
+
+def entries_for_groups(group_ids):
+    # A subquery on the through table avoids DISTINCT over the M2M join
+    return Entry.objects.filter(
+        id__in=Entry.groups.through.objects.filter(group__in=group_ids).values('entry')
+    )
@@ -1,6 +1,9 @@
+import numpy as np
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import Entry, Filter
+from .ingest import parse_quarter_label, quarter_label_dates
+from .models import Entry, EntryCount, ExportJob, Filter, UploadJob
 from users.models import Group
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -22,6 +25,13 @@ class EntrySerializer(serializers.ModelSerializer):
         if exclude_groups:
             self.fields.pop('groups', None)
 
+class EntryCountSerializer(serializers.ModelSerializer):
+    group_name = serializers.CharField(source='group.name', read_only=True)
+
+    class Meta:
+        model = EntryCount
+        fields = ['id', 'group', 'group_name', 'classification', 'csection', 'period', 'count']
+
 class FilterSerializer(serializers.ModelSerializer):
     groups = GroupSerializer(many=True, read_only=True)
 
@@ -32,4 +42,117 @@ class FilterSerializer(serializers.ModelSerializer):
 class FilterIDSerializer(serializers.ModelSerializer):
     class Meta:
         model = Filter
-        fields = ['id']
\ No newline at end of file
+        fields = ['id']
+
+class UploadJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = UploadJob
+        fields = [
+            'id', 'filename', 'status', 'parsed_count', 'inserted_count',
+            'rows_per_second', 'error', 'report', 'created_on', 'started_on', 'finished_on',
+        ]
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'format', 'status', 'start_date', 'end_date', 'email', 'row_count',
+            'error', 'created_on', 'started_on', 'finished_on', 'download_url',
+        ]
+
+    def get_download_url(self, job):
+        if job.status != ExportJob.DONE or not job.file:
+            return None
+        url = reverse('survey:export-download', args=[job.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+# EntryCount.count is a PositiveIntegerField, a 32-bit integer on PostgreSQL
+MAX_COUNT = 2147483647
+
+
+class CountMatrixSerializer(serializers.Serializer):
+    """
+    A quarterly submission in the GenerateQuarterlyXLSX layout: one row of
+    counts per Robson group with a Vaginal/C-section pair per quarter.
+    """
+    quarters = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    groups = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        required=False,
+    )
+    counts = serializers.ListField(child=serializers.ListField(), allow_empty=False)
+
+    def validate_quarters(self, quarters):
+        dates = []
+        for label in quarters:
+            try:
+                if not label.startswith("Quarter"):
+                    raise ValueError
+                start, end = quarter_label_dates(label)
+                dates.append(parse_quarter_label(label))
+            except (IndexError, ValueError):
+                raise serializers.ValidationError(f'Invalid quarter label "{label}".')
+            if end < start:
+                raise serializers.ValidationError(f'Quarter "{label}" ends before it starts.')
+        # Cells of a repeated quarter would be summed into the same period
+        if len(set(dates)) != len(dates):
+            raise serializers.ValidationError('Quarters must not repeat.')
+        return list(zip(quarters, dates))
+
+    def validate_groups(self, groups):
+        valid = np.array([value for value, _ in Entry.CLASSIFICATIONS])
+        labels = np.array(groups)
+        unknown = labels[~np.isin(labels, valid)]
+        if unknown.size:
+            raise serializers.ValidationError(f'Unknown Robson groups: {", ".join(unknown)}.')
+        if np.unique(labels).size != labels.size:
+            raise serializers.ValidationError('Robson groups must not repeat.')
+        return groups
+
+    def validate(self, data):
+        groups = data.get('groups') or [value for value, _ in Entry.CLASSIFICATIONS]
+        quarters = data['quarters']
+
+        try:
+            matrix = np.asarray(data['counts'])
+        except ValueError:
+            raise serializers.ValidationError({'counts': 'Every row must have the same length.'})
+
+        expected = (len(groups), 2 * len(quarters))
+        if matrix.shape != expected:
+            raise serializers.ValidationError(
+                {'counts': f'Expected a {expected[0]} x {expected[1]} matrix, got {" x ".join(map(str, matrix.shape))}.'}
+            )
+        if matrix.dtype.kind == 'f':
+            if not (np.isfinite(matrix).all() and (matrix == np.floor(matrix)).all()):
+                raise serializers.ValidationError({'counts': 'Counts must be whole numbers.'})
+        elif matrix.dtype.kind not in 'iu':
+            raise serializers.ValidationError({'counts': 'Counts must be whole numbers.'})
+        negative = np.argwhere(matrix < 0)
+        if negative.size:
+            row, column = negative[0]
+            raise serializers.ValidationError(
+                {'counts': f'Counts must not be negative (row {row}, column {column}).'}
+            )
+        # Checked before the cast, which would wrap larger values around
+        too_large = np.argwhere(matrix > MAX_COUNT)
+        if too_large.size:
+            row, column = too_large[0]
+            raise serializers.ValidationError(
+                {'counts': f'Counts must not exceed {MAX_COUNT} (row {row}, column {column}).'}
+            )
+
+        matrix = matrix.astype(np.int64)
+        data['cells'] = [
+            (groups[row], bool(column % 2), quarters[column // 2][1], int(matrix[row, column]))
+            for row in range(matrix.shape[0])
+            for column in range(matrix.shape[1])
+        ]
+        return data
@@ -0,0 +1,122 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Entry, Filter
+from .rollups import apply_rollup, rollup_key
+from users.models import Group
+
+EntryGroups = Entry.groups.through
+FilterGroups = Filter.groups.through
+
+
+def _entry_links(instance, reverse, pk_set=None):
+    # (entry, group_id) pairs currently linked, optionally limited to pk_set
+    if reverse:
+        entries = Entry.objects.filter(groups=instance)
+        if pk_set is not None:
+            entries = entries.filter(pk__in=pk_set)
+        return [(entry, instance.pk) for entry in entries]
+
+    group_ids = EntryGroups.objects.filter(entry=instance).values_list('group', flat=True)
+    if pk_set is not None:
+        group_ids = group_ids.filter(group__in=pk_set)
+    return [(instance, group_id) for group_id in group_ids]
+
+
+@receiver(m2m_changed, sender=EntryGroups)
+def update_rollup_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            links = [(entry, instance.pk) for entry in Entry.objects.filter(pk__in=pk_set)]
+        else:
+            links = [(instance, group_id) for group_id in pk_set]
+        sign = 1
+    elif action == 'pre_remove':
+        # pk_set may name groups that are not linked, so look at what is
+        links = _entry_links(instance, reverse, pk_set)
+        sign = -1
+    elif action == 'pre_clear':
+        links = _entry_links(instance, reverse)
+        sign = -1
+    else:
+        return
+
+    apply_rollup(Counter({rollup_key(group_id, entry): sign for entry, group_id in links}))
+
+
+@receiver(m2m_changed, sender=EntryGroups)
+def bump_shared_group_versions(sender, instance, action, reverse, pk_set, **kwargs):
+    # Exports list every group of an entry, so linking or unlinking one also
+    # changes what the entry's other groups show
+    if action in ('post_add', 'post_remove'):
+        entry_ids = pk_set if reverse else [instance.pk]
+    elif action == 'pre_clear':
+        entry_ids = Entry.objects.filter(groups=instance).values('pk') if reverse else [instance.pk]
+    else:
+        return
+    Group.bump_data_version(EntryGroups.objects.filter(entry__in=entry_ids).values('group'))
+
+
+@receiver(pre_delete, sender=Entry)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    # The through rows are removed without an m2m_changed signal
+    apply_rollup(Counter({
+        rollup_key(group_id, entry): -1 for entry, group_id in _entry_links(instance, reverse=False)
+    }))
+
+
+@receiver(pre_save, sender=Entry)
+def remember_rollup_key(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous = Entry.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Entry)
+def update_rollup_on_change(sender, instance, created, raw, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    instance._previous = None
+    if created or raw or previous is None:
+        return
+
+    deltas = Counter()
+    for _, group_id in _entry_links(instance, reverse=False):
+        deltas[rollup_key(group_id, previous)] -= 1
+        deltas[rollup_key(group_id, instance)] += 1
+    apply_rollup(deltas)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw, update_fields=None, **kwargs):
+    instance._renamed = False
+    if raw or instance._state.adding:
+        return
+    # Logins save last_login alone, so they cost no extra query
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    instance._renamed = User.objects.filter(pk=instance.pk).exclude(username=instance.username).exists()
+
+
+@receiver(post_save, sender=User)
+def bump_renamed_user_group_versions(sender, instance, **kwargs):
+    # Entry lists and exports show each entry's author
+    if getattr(instance, '_renamed', False):
+        instance._renamed = False
+        Group.bump_data_version(EntryGroups.objects.filter(entry__user=instance).values('group'))
+
+
+@receiver(m2m_changed, sender=FilterGroups)
+def bump_filter_group_versions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        group_ids = [instance.pk]
+    elif action == 'pre_clear':
+        group_ids = list(instance.groups.values_list('pk', flat=True))
+    else:
+        group_ids = pk_set
+    if group_ids:
+        Group.bump_data_version(group_ids)
@@ -0,0 +1,96 @@
+import csv
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Entry
+
+CHUNK_SIZE = 2000
+
+ENTRY_FIELDS = ['id', 'classification', 'user__username', 'csection', 'date']
+
+CSV_HEADER = ['id', 'classification', 'user', 'csection', 'date', 'groups']
+
+
+def iter_entry_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of entry dicts (with 'groups' as a list of names) in
+    (date, id) order, using two queries per chunk however large the
+    queryset is.
+    """
+    queryset = queryset.order_by('date', 'id').values(*ENTRY_FIELDS)
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(Q(date__gt=last[0]) | Q(date=last[0], id__gt=last[1]))
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+
+        groups = defaultdict(list)
+        links = Entry.groups.through.objects.filter(
+            entry__in=[row['id'] for row in rows]
+        ).order_by('id').values_list('entry', 'group__name')
+        for entry_id, group_name in links:
+            groups[entry_id].append(group_name)
+        for row in rows:
+            row['groups'] = groups[row['id']]
+        yield rows
+
+        if len(rows) < chunk_size:
+            return
+        last = (rows[-1]['date'], rows[-1]['id'])
+
+
+def _entry_json(row):
+    return json.dumps({
+        'id': row['id'],
+        'classification': row['classification'],
+        'user': row['user__username'],
+        'groups': row['groups'],
+        'csection': row['csection'],
+        'date': row['date'].isoformat(),
+    }, cls=DjangoJSONEncoder)
+
+
+def stream_entries_json(queryset, chunk_size=CHUNK_SIZE):
+    # Writes {"entries": [...]} one chunk at a time
+    yield '{"entries": ['
+    separator = ''
+    for rows in iter_entry_chunks(queryset, chunk_size):
+        yield separator + ', '.join(_entry_json(row) for row in rows)
+        separator = ', '
+    yield ']}'
+
+
+def entry_chunks_ndjson(chunks):
+    """Yield one JSON object per line, one string per chunk from iter_entry_chunks."""
+    for rows in chunks:
+        yield ''.join(_entry_json(row) + '\n' for row in rows)
+
+
+class _Echo:
+    # csv.writer only needs write(); returning the line lets it be yielded
+    def write(self, value):
+        return value
+
+
+def entry_chunks_csv(chunks):
+    """Yield the survey CSV export, one string per chunk from iter_entry_chunks."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for rows in chunks:
+        yield ''.join(
+            writer.writerow([
+                row['id'],
+                row['classification'],
+                row['user__username'],
+                row['csection'],
+                row['date'],
+                ', '.join(row['groups']),
+            ])
+            for row in rows
+        )
@@ -1,3 +1,1528 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.http import FileResponse
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.urls import reverse
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users.models import Group, UserProfile
+from .archives import parse_archive
+from .benchmarks import benchmark_upload, legacy_xlsx_cells, streaming_xlsx_cells, synthetic_quarters, synthetic_xlsx
+from .ingest import iter_csv_rows, parse_quarterly_rows
+from .export_cache import evict_exports, export_cache_stats
+from .exports import available_formats
+from .jobs import expire_export_jobs, run_upload_job
+from .ingest import add_entry_counts, bulk_insert_entries
+from .models import Entry, EntryCount, EntryRollup, ExportJob, Filter, UploadJob
+from .reports import classification_counts, fiscal_quarter_label, group_classification_counts
+from .rollups import rebuild_rollup, rollup_totals
+from .scopes import entries_for_groups
+from .streaming import CHUNK_SIZE
+
+QUARTERS = [
+    "Quarter 1: 1st July 2023 - 30th September 2023",
+    "Quarter 2: 1st October 2023 - 31st December 2023",
+]
+GROUP_LABELS = [
+    "Group 1", "Group 2", "Group 3", "Group 4", "Group 5.1",
+    "Group 5.2", "Group 6", "Group 7", "Group 8", "Group 9", "Group 10"
+]
+
+
+def build_quarterly_rows(counts, quarters=QUARTERS):
+    # Same layout as GenerateQuarterlyXLSX: counts maps (label, quarter index) -> (vaginal, csection)
+    rows = [
+        ["Group Robson"] + [value for quarter in quarters for value in (quarter, None)] + ["Final", None],
+        [None] + ["Vaginal Delivery", "C/Section"] * (len(quarters) + 1),
+    ]
+    for label in GROUP_LABELS:
+        row = [label]
+        for index in range(len(quarters)):
+            row.extend(counts.get((label, index), (0, 0)))
+        rows.append(row)
+    rows.append(["No Record"] + [0] * (len(quarters) * 2))
+    return rows
+
+
+def build_xlsx(counts, name='quarterly.xlsx', quarters=QUARTERS):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Robson Quarterly Report"])
+    for row in build_quarterly_rows(counts, quarters):
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def build_csv(counts, name='quarterly.csv', quarters=QUARTERS):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Robson Quarterly Report"])
+    for row in build_quarterly_rows(counts, quarters):
+        writer.writerow(['' if value is None else value for value in row])
+    return SimpleUploadedFile(name, buffer.getvalue().encode('utf-8'))
+
+
+def use_temp_storage(testcase):
+    """Point MEDIA_ROOT and the export cache at a directory removed after the test."""
+    directory = tempfile.TemporaryDirectory()
+    testcase.addCleanup(directory.cleanup)
+    root = Path(directory.name)
+    settings_override = override_settings(MEDIA_ROOT=root / 'media', EXPORT_CACHE_DIR=root / 'export_cache')
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+    return root
+
+
+class ChunkedUpload:
+    # Mimics an UploadedFile whose handler delivers data in tiny chunks
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+
+    def chunks(self):
+        for start in range(0, len(self.data), self.size):
+            yield self.data[start:start + self.size]
+
+
+class QuarterlyParserTests(SimpleTestCase):
+
+    def test_csv_rows_split_across_chunks(self):
+        data = build_csv({("Group 2", 1): (7, 3), ("Group 9", 0): (0, 12)}).read()
+        data = data.replace(b'\n', b'\r\n').replace(b'Robson', 'R\u00f6bson'.encode('utf-8'))
+
+        cells = [cell for cell in parse_quarterly_rows(iter_csv_rows(ChunkedUpload(data, 7))) if cell[3]]
+
+        self.assertEqual(
+            [(c, cs, d.date().isoformat(), n) for c, cs, d, n in cells],
+            [
+                ('2', False, '2023-12-31', 7),
+                ('2', True, '2023-12-31', 3),
+                ('9', True, '2023-09-30', 12),
+            ]
+        )
+
+    def test_xlsx_reader_matches_pandas_path(self):
+        data = synthetic_xlsx(synthetic_quarters(3), 25)
+
+        cells = streaming_xlsx_cells(data)
+        self.assertEqual(cells, legacy_xlsx_cells(data))
+        self.assertEqual(len(cells), 11 * 2 * 12)
+
+    def test_rejects_negative_counts(self):
+        rows = build_quarterly_rows({("Group 1", 0): (-1, 0)})
+        with self.assertRaises(ValueError):
+            list(parse_quarterly_rows(rows))
+
+
+class UploadFileTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='uploadpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group, can_add=True)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('survey:entry-upload')
+        self.storage = use_temp_storage(self)
+
+    def upload(self, file):
+        response = self.client.post(self.url, {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], UploadJob.QUEUED)
+        call_command('process_upload_jobs', '--once', stdout=StringIO())
+        return self.client.get(reverse('survey:upload-job', args=[response.data['id']]))
+
+    def count(self, **filters):
+        return sum(EntryCount.objects.filter(**filters).values_list('count', flat=True))
+
+    def test_upload_xlsx_counts_births_for_uploader_groups(self):
+        counts = {("Group 1", 0): (3, 2), ("Group 5.1", 1): (0, 4)}
+        response = self.upload(build_xlsx(counts))
+
+        self.assertEqual(response.data['status'], UploadJob.DONE)
+        self.assertEqual(response.data['parsed_count'], 9)
+        self.assertEqual(response.data['inserted_count'], 9)
+        self.assertIsNotNone(response.data['rows_per_second'])
+
+        self.assertEqual(self.count(classification='1', csection=False), 3)
+        self.assertEqual(self.count(classification='1', csection=True), 2)
+        self.assertEqual(self.count(classification='5.1', csection=True, period=date(2023, 12, 31)), 4)
+        self.assertEqual(self.count(group=self.group), 9)
+        self.assertEqual(EntryCount.objects.count(), 3)
+        self.assertFalse(EntryCount.objects.filter(group=self.other_group).exists())
+        self.assertFalse(Entry.objects.exists())
+
+    def test_upload_csv_in_memory(self):
+        counts = {("Group 3", 0): (5, 1), ("Group 10", 1): (2, 2)}
+        response = self.upload(build_csv(counts))
+
+        self.assertEqual(response.data['inserted_count'], 10)
+        self.assertEqual(self.count(classification='10', csection=True), 2)
+
+    def test_reupload_replaces_the_quarters_it_covers(self):
+        self.upload(build_xlsx({("Group 2", 0): (10, 5), ("Group 2", 1): (7, 7)}))
+        self.upload(build_csv({("Group 2", 0): (1, 1), ("Group 4", 0): (3, 0)}, quarters=QUARTERS[:1]))
+
+        self.assertEqual(self.count(classification='2', period=date(2023, 9, 30)), 2)
+        self.assertEqual(self.count(classification='2', period=date(2023, 12, 31)), 14)
+        self.assertEqual(self.count(classification='4'), 3)
+
+    def test_changed_file_replaces_previous_upload(self):
+        self.upload(build_xlsx({("Group 2", 0): (10, 5), ("Group 6", 1): (2, 2)}))
+        response = self.upload(build_xlsx({("Group 2", 0): (10, 6)}))
+
+        self.assertEqual(response.data['status'], UploadJob.DONE)
+        self.assertEqual(self.count(classification='2', csection=True), 6)
+        self.assertEqual(self.count(classification='6'), 0)
+        self.assertEqual(self.count(), 16)
+
+    def test_identical_reupload_is_rejected(self):
+        # Built once: openpyxl stamps each workbook with the time it was saved
+        data = build_xlsx({("Group 1", 0): (3, 2)}).read()
+        self.upload(SimpleUploadedFile('quarterly.xlsx', data))
+
+        # Memberships are cached by the first upload; the earlier job, its
+        # groups and the quarters of any later jobs are looked up
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, {'file': SimpleUploadedFile('quarterly.xlsx', data)},
+                                        format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(UploadJob.objects.count(), 1)
+        self.assertEqual(self.count(), 5)
+
+    def test_reupload_after_other_quarters_changed_is_rejected(self):
+        data = build_csv({("Group 1", 0): (3, 2)}, quarters=QUARTERS[:1]).read()
+        self.upload(SimpleUploadedFile('quarterly.csv', data))
+        self.upload(build_csv({("Group 4", 0): (1, 1)}, quarters=QUARTERS[1:]))
+
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('quarterly.csv', data)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_reupload_restores_quarters_replaced_since(self):
+        data = build_csv({("Group 1", 0): (3, 2)}).read()
+        self.upload(SimpleUploadedFile('quarterly.csv', data))
+        self.upload(build_csv({("Group 4", 0): (1, 1)}))
+        self.assertEqual(self.count(classification='1'), 0)
+
+        response = self.upload(SimpleUploadedFile('quarterly.csv', data))
+        self.assertEqual(response.data['status'], UploadJob.DONE)
+        self.assertEqual(self.count(classification='1'), 5)
+        self.assertEqual(self.count(classification='4'), 0)
+
+    def test_same_file_for_other_groups_is_accepted(self):
+        data = build_csv({("Group 1", 0): (3, 2)}).read()
+        self.upload(SimpleUploadedFile('quarterly.csv', data))
+
+        # A network coordinator who can also add to the other hospital
+        coordinator = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        for group in (self.group, self.other_group):
+            UserProfile.objects.create(user=coordinator, group=group, can_add=True)
+        self.client.force_authenticate(user=coordinator)
+
+        response = self.upload(SimpleUploadedFile('quarterly.csv', data))
+        self.assertEqual(response.data['status'], UploadJob.DONE)
+        self.assertEqual(self.count(group=self.other_group), 5)
+
+    def test_upload_is_removed_from_storage_once_ingested(self):
+        self.upload(build_csv({("Group 3", 0): (5, 1)}))
+        self.client.post(self.url, {'file': build_csv({("Group 3", 0): (5, 1)})}, format='multipart')
+
+        self.assertEqual(list((self.storage / 'media' / 'uploads').iterdir()), [])
+        self.assertEqual(UploadJob.objects.get().upload.name, '')
+
+    def test_upload_does_not_query_per_birth(self):
+        job = UploadJob.objects.create(
+            user=self.user,
+            filename='large.xlsx',
+            upload=ContentFile(
+                build_xlsx({("Group 1", 0): (40000, 30000), ("Group 10", 1): (250, 50)}).read(),
+                name='large.xlsx',
+            ),
+        )
+        job.groups.set([self.group])
+
+        with CaptureQueriesContext(connection) as queries:
+            run_upload_job(job)
+
+        self.assertEqual(job.inserted_count, 70300)
+        self.assertLess(len(queries), 15)
+
+    def test_upload_invalid_format(self):
+        wb = Workbook()
+        wb.active.append(["Group Robson", "Not a quarter"])
+        buffer = BytesIO()
+        wb.save(buffer)
+
+        response = self.upload(SimpleUploadedFile('bad.xlsx', buffer.getvalue()))
+        self.assertEqual(response.data['status'], UploadJob.FAILED)
+        self.assertEqual(response.data['error'], 'Invalid format')
+        self.assertFalse(Entry.objects.exists())
+
+    def test_unsupported_extension_rejected_before_queueing(self):
+        response = self.client.post(
+            self.url, {'file': SimpleUploadedFile('notes.txt', b'Group')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(UploadJob.objects.exists())
+
+    def test_view_only_member_cannot_write(self):
+        self.upload(build_xlsx({("Group 2", 0): (10, 5)}))
+        viewer = User.objects.create_user(username='viewer', password='viewerpass')
+        UserProfile.objects.create(user=viewer, group=self.group, can_view=True)
+        self.client.force_authenticate(user=viewer)
+
+        requests = [
+            (self.url, {'file': build_csv({("Group 2", 0): (0, 0)})}, 'multipart'),
+            ('/survey/entries/', {'classification': '1'}, 'json'),
+            ('/survey/entries/', [{'classification': '1'}], 'json'),
+            (reverse('survey:entry-matrix'), {'quarters': QUARTERS[:1], 'groups': ['2'], 'counts': [[0, 0]]}, 'json'),
+        ]
+        for url, data, request_format in requests:
+            response = self.client.post(url, data, format=request_format)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, url)
+
+        # The group's quarter is left as uploaded
+        self.assertEqual(self.count(), 15)
+        self.assertFalse(Entry.objects.exists())
+
+    def test_rights_are_rechecked_when_the_job_runs(self):
+        self.upload(build_xlsx({("Group 2", 0): (10, 5)}))
+        response = self.client.post(self.url, {'file': build_csv({("Group 2", 0): (1, 1)})}, format='multipart')
+
+        profile = UserProfile.objects.get(user=self.user, group=self.group)
+        profile.can_add = False
+        profile.save()
+        call_command('process_upload_jobs', '--once', stdout=StringIO())
+
+        job = UploadJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertEqual(self.count(), 15)
+
+    def test_jobs_left_running_by_a_crashed_worker_are_failed(self):
+        job = UploadJob.objects.create(
+            user=self.user,
+            filename='quarterly.csv',
+            upload=ContentFile(build_csv({("Group 1", 0): (1, 1)}).read(), name='quarterly.csv'),
+            status=UploadJob.RUNNING,
+            started_on=datetime.now(dt_timezone.utc) - timedelta(hours=2),
+        )
+        running = UploadJob.objects.create(
+            user=self.user, filename='other.csv', status=UploadJob.RUNNING, started_on=datetime.now(dt_timezone.utc)
+        )
+
+        call_command('process_upload_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertEqual(job.error, 'The worker stopped before the job finished.')
+        self.assertEqual(list((self.storage / 'media' / 'uploads').iterdir()), [])
+        running.refresh_from_db()
+        self.assertEqual(running.status, UploadJob.RUNNING)
+
+    def test_cannot_poll_another_users_job(self):
+        other = User.objects.create_user(username='other', password='otherpass')
+        job = UploadJob.objects.create(user=other, filename='x.csv')
+
+        response = self.client.get(reverse('survey:upload-job', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EntryCountListTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.hidden_group = Group.objects.create(name='Hidden Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        UserProfile.objects.create(user=self.user, group=self.hidden_group, can_view=False)
+
+        for group in (self.group, self.hidden_group, self.other_group):
+            EntryCount.objects.create(group=group, classification='1', period=date(2024, 3, 31), count=40)
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_lists_counts_for_viewable_groups(self):
+        response = self.client.get(reverse('survey:entry-counts'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['group'] for row in response.data], [self.group.pk])
+        self.assertEqual(response.data[0]['count'], 40)
+
+    def test_group_scope_requires_view_permission(self):
+        url = reverse('survey:entry-counts-filter', args=[f'group-{self.hidden_group.pk}'])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_filter_scope_only_includes_viewable_groups(self):
+        user_filter = Filter.objects.create(name='Network', user=self.user)
+        user_filter.groups.set([self.group, self.other_group])
+
+        url = reverse('survey:entry-counts-filter', args=[f'filter-{user_filter.pk}'])
+        response = self.client.get(url)
+        self.assertEqual([row['group_name'] for row in response.data], ['Test Hospital'])
+
+
+class BatchEntryCreateTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='midwife', password='midwifepass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group, can_add=True)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = '/survey/entries/'
+
+    def test_creates_batch_in_constant_queries(self):
+        data = [
+            {'classification': str(index % 4 + 1), 'csection': index % 3 == 0, 'date': '2024-02-01T08:00:00Z'}
+            for index in range(300)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 300)
+        self.assertEqual(len(response.data['ids']), 300)
+        self.assertLess(len(queries), 10)
+
+        self.assertEqual(Entry.objects.filter(groups=self.group).count(), 300)
+        self.assertEqual(Entry.objects.filter(csection=True).count(), 100)
+        self.assertFalse(Entry.objects.filter(groups=self.other_group).exists())
+        self.assertFalse(Entry.objects.exclude(user=self.user).exists())
+
+    def test_reports_errors_per_item(self):
+        data = [
+            {'classification': '1'},
+            {'classification': '11'},
+            {'classification': '5.2', 'date': 'yesterday'},
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('classification', response.data['errors'][0]['errors'])
+        self.assertIn('date', response.data['errors'][1]['errors'])
+        self.assertFalse(Entry.objects.exists())
+
+    def test_single_entry_only_joins_authors_groups(self):
+        response = self.client.post(self.url, {'classification': '3', 'csection': True}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entry = Entry.objects.get()
+        self.assertEqual(list(entry.groups.all()), [self.group])
+
+
+class CountMatrixTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='submitter', password='submitterpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group, can_add=True)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('survey:entry-matrix')
+
+    def test_submits_full_matrix(self):
+        counts = [[index, index * 2, 0, 1] for index in range(11)]
+        response = self.client.post(self.url, {'quarters': QUARTERS, 'counts': counts}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], sum(map(sum, counts)))
+        row = EntryCount.objects.get(classification='10', csection=True, period=date(2023, 9, 30))
+        self.assertEqual(row.count, 20)
+        self.assertEqual(EntryCount.objects.filter(period=date(2023, 12, 31)).count(), 11)
+
+    def test_submits_selected_groups(self):
+        data = {'quarters': QUARTERS[:1], 'groups': ['5.1', '5.2'], 'counts': [[4, 6], [1, 0]]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(EntryCount.objects.values_list('classification', 'csection', 'count')),
+            [('5.1', False, 4), ('5.1', True, 6), ('5.2', False, 1)]
+        )
+
+    def test_rejects_invalid_matrices(self):
+        invalid = [
+            {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, -2]]},
+            {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, 2.5]]},
+            {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, 'two']]},
+            {'quarters': QUARTERS[:1], 'groups': ['1', '2'], 'counts': [[1, 2], [3]]},
+            {'quarters': QUARTERS, 'groups': ['1'], 'counts': [[1, 2]]},
+            {'quarters': QUARTERS[:1], 'groups': ['12'], 'counts': [[1, 2]]},
+            {'quarters': ['Quarter 5: sometime'], 'groups': ['1'], 'counts': [[1, 2]]},
+            {'quarters': [QUARTERS[0], QUARTERS[0]], 'groups': ['1'], 'counts': [[1, 2, 1, 2]]},
+            {'quarters': ['Quarter 1: 1st July 2023 - 15th March 2023'], 'groups': ['1'], 'counts': [[1, 2]]},
+        ]
+        for data in invalid:
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        self.assertFalse(EntryCount.objects.exists())
+
+    def test_rejects_counts_beyond_the_column_range(self):
+        for count in (1e20, 2 ** 40, 2147483648, 2 ** 70):
+            data = {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, count]]}
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, count)
+
+        data = {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, 2147483647]]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_only_replaces_groups_the_member_may_add_to(self):
+        viewed_group = Group.objects.create(name='Viewed Hospital')
+        UserProfile.objects.create(user=self.user, group=viewed_group, can_view=True)
+        add_entry_counts([('1', False, datetime(2023, 9, 1, tzinfo=dt_timezone.utc), 9)], [viewed_group.pk])
+
+        data = {'quarters': QUARTERS[:1], 'groups': ['1'], 'counts': [[1, 0]]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(EntryCount.objects.get(group=viewed_group).count, 9)
+        self.assertEqual(EntryCount.objects.get(group=self.group).count, 1)
+
+
+def build_zip(files):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, upload in files.items():
+            archive.writestr(name, upload.read() if hasattr(upload, 'read') else upload)
+    return buffer.getvalue()
+
+
+@override_settings(UPLOAD_ARCHIVE_WORKERS=1)
+class ArchiveUploadTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        self.north = Group.objects.create(name='North Hospital')
+        self.south = Group.objects.create(name='South Hospital')
+        for group in (self.north, self.south):
+            UserProfile.objects.create(user=self.user, group=group, can_add=True)
+
+        self.client.force_authenticate(user=self.user)
+        use_temp_storage(self)
+        self.archive = build_zip({
+            'network/North Hospital.xlsx': build_xlsx({("Group 1", 0): (10, 2)}),
+            'network/south hospital.csv': build_csv({("Group 7", 1): (1, 3)}),
+            'network/East Hospital.csv': build_csv({("Group 2", 0): (5, 5)}),
+            'network/broken.xlsx': b'not a workbook',
+            'network/readme.txt': b'notes',
+            '__MACOSX/network/._North Hospital.xlsx': b'',
+        })
+
+    def assert_report(self, report):
+        self.assertEqual(
+            [(row['file'].split('/')[-1], row['status'], row['group'], row['count']) for row in report],
+            [
+                ('North Hospital.xlsx', 'done', 'North Hospital', 12),
+                ('south hospital.csv', 'done', 'South Hospital', 4),
+                ('East Hospital.csv', 'failed', None, 0),
+                ('broken.xlsx', 'failed', None, 0),
+                ('readme.txt', 'skipped', None, 0),
+            ]
+        )
+        self.assertEqual(EntryCount.objects.get(group=self.north, csection=True).count, 2)
+        self.assertEqual(EntryCount.objects.get(group=self.south, csection=True).count, 3)
+
+    def test_zip_upload_job_reports_per_file(self):
+        archive = SimpleUploadedFile('network.zip', self.archive)
+        response = self.client.post(reverse('survey:entry-upload'), {'file': archive}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        call_command('process_upload_jobs', '--once', stdout=StringIO())
+        response = self.client.get(reverse('survey:upload-job', args=[response.data['id']]))
+
+        self.assertEqual(response.data['status'], UploadJob.DONE)
+        self.assertEqual(response.data['inserted_count'], 16)
+        self.assertEqual(response.data['error'], '2 of 5 files failed.')
+        self.assert_report(response.data['report'])
+
+    def test_sheets_covering_the_same_quarter_are_not_recorded(self):
+        archive = build_zip({
+            'q1/North Hospital.csv': build_csv({("Group 1", 0): (10, 2)}, quarters=QUARTERS[:1]),
+            'all/North Hospital.csv': build_csv({("Group 1", 0): (20, 4)}),
+            'q2/South Hospital.csv': build_csv({("Group 1", 0): (1, 1)}, quarters=QUARTERS[1:]),
+            'all/South Hospital.csv': build_csv({("Group 1", 0): (3, 3)}, quarters=QUARTERS[:1]),
+        })
+        response = self.client.post(
+            reverse('survey:entry-upload'), {'file': SimpleUploadedFile('network.zip', archive)}, format='multipart'
+        )
+        call_command('process_upload_jobs', '--once', stdout=StringIO())
+        report = UploadJob.objects.get(pk=response.data['id']).report
+
+        self.assertEqual(
+            [(row['status'], row['error']) for row in report],
+            [
+                ('failed', 'Covers the same group and quarters as all/North Hospital.csv'),
+                ('failed', 'Covers the same group and quarters as q1/North Hospital.csv'),
+                ('done', ''),
+                ('done', ''),
+            ]
+        )
+        self.assertFalse(EntryCount.objects.filter(group=self.north).exists())
+        self.assertEqual(sum(EntryCount.objects.filter(group=self.south).values_list('count', flat=True)), 8)
+
+    def test_ingest_archive_command(self):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile(suffix='.zip') as archive:
+            archive.write(self.archive)
+            archive.flush()
+            call_command('ingest_archive', archive.name, '--user', 'coordinator', '--json', stdout=out)
+
+        self.assert_report(json.loads(out.getvalue()))
+
+    def test_parse_archive_in_process_pool(self):
+        results = parse_archive(self.archive, workers=2)
+
+        self.assertEqual(len(results), 5)
+        name, cells, error = results[0]
+        self.assertEqual(name, 'network/North Hospital.xlsx')
+        self.assertEqual(sum(count for _, _, _, count in cells), 12)
+        self.assertIsNone(error)
+        self.assertIsNotNone(results[3][2])
+
+
+class UploadBenchmarkTests(APITestCase):
+
+    def setUp(self):
+        use_temp_storage(self)
+
+    def test_benchmark_upload_rolls_back(self):
+        for file_format in ('csv', 'xlsx'):
+            result = benchmark_upload(file_format, synthetic_quarters(1), 50000)
+
+            self.assertEqual(result['status'], UploadJob.DONE)
+            self.assertEqual(result['births'], 11 * 2 * 4 * 50000)
+            self.assertGreater(result['rows_per_second'], 0)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+            self.assertLess(result['queries'], 20)
+
+        self.assertFalse(UploadJob.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_benchmark_reuses_an_existing_benchmark_user(self):
+        User.objects.create_user(username='upload-benchmark')
+
+        result = benchmark_upload('csv', synthetic_quarters(1), 1)
+
+        self.assertEqual(result['status'], UploadJob.DONE)
+        self.assertEqual(User.objects.get().username, 'upload-benchmark')
+        self.assertFalse(UploadJob.objects.exists())
+
+    def test_command_writes_results_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_uploads', '--births', '1', '10', '--output', output.name, stdout=StringIO())
+            results = json.load(output)['results']
+
+        self.assertEqual([(r['format'], r['births_per_cell']) for r in results],
+                         [('csv', 1), ('csv', 10), ('xlsx', 1), ('xlsx', 10)])
+
+
+class RobsonReportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='analystpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('survey:report')
+
+        entries = [
+            Entry(classification='1', csection=True, date=datetime(2024, 1, 10, tzinfo=dt_timezone.utc)),
+            Entry(classification='1', csection=False, date=datetime(2024, 1, 11, tzinfo=dt_timezone.utc)),
+            Entry(classification='5.1', csection=True, date=datetime(2024, 5, 1, tzinfo=dt_timezone.utc)),
+        ]
+        for entry in Entry.objects.bulk_create(entries):
+            entry.groups.set([self.group, self.other_group])
+        EntryCount.objects.bulk_create([
+            EntryCount(group=self.group, classification='1', csection=False, period=date(2024, 3, 31), count=6),
+            EntryCount(group=self.group, classification='5.2', csection=True, period=date(2024, 3, 31), count=2),
+            EntryCount(group=self.other_group, classification='1', csection=False, period=date(2024, 3, 31), count=90),
+        ])
+        # bulk_create on EntryCount bypasses the rollup
+        rebuild_rollup()
+
+    def rows(self, response):
+        return {row['classification']: row for row in response.data['rows']}
+
+    def test_report_combines_entries_and_counts(self):
+        # Memberships, group data versions and the report itself
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'group': self.group.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['births'], 11)
+        self.assertEqual(response.data['csections'], 4)
+        rows = self.rows(response)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual((rows['1']['births'], rows['1']['csections']), (8, 1))
+        self.assertEqual(rows['1']['group_size'], 72.73)
+        self.assertEqual(rows['1']['csection_rate'], 12.5)
+        self.assertEqual(rows['5.2']['absolute_contribution'], 18.18)
+        self.assertEqual(rows['5.2']['relative_contribution'], 50.0)
+        self.assertIsNone(rows['7']['csection_rate'])
+
+    def test_report_date_range(self):
+        response = self.client.get(self.url, {'start_date': '2024-01-11', 'end_date': '2024-03-31'})
+
+        self.assertEqual(response.data['births'], 9)
+        self.assertEqual(self.rows(response)['5.1']['births'], 0)
+
+    def test_report_rejects_bad_dates_and_hidden_groups(self):
+        response = self.client.get(self.url, {'start_date': '31/01/2024'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'group': self.other_group.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class EntryRollupTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        self.day = datetime(2024, 2, 1, 9, tzinfo=dt_timezone.utc)
+
+    def rollup(self):
+        return {
+            (row.group_id, row.classification, row.csection, row.day): row.count
+            for row in EntryRollup.objects.all()
+        }
+
+    def assertRollupMatchesRebuild(self):
+        incremental = self.rollup()
+        self.assertEqual(incremental, {key: count for key, count in rollup_totals().items() if count})
+        rebuild_rollup()
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_group_changes_and_deletes(self):
+        entry = Entry.objects.create(classification='1', csection=True, date=self.day)
+        entry.groups.set([self.group, self.other_group])
+        self.assertEqual(self.rollup(), {
+            (self.group.pk, '1', True, date(2024, 2, 1)): 1,
+            (self.other_group.pk, '1', True, date(2024, 2, 1)): 1,
+        })
+
+        entry.groups.remove(self.other_group, self.other_group.pk + 100)
+        self.other_group.entries.add(Entry.objects.create(classification='1', csection=True, date=self.day))
+        self.assertRollupMatchesRebuild()
+
+        entry.csection = False
+        entry.save()
+        self.assertRollupMatchesRebuild()
+
+        self.group.entries.clear()
+        Entry.objects.all().delete()
+        self.assertEqual(self.rollup(), {})
+
+    def test_bulk_paths(self):
+        cells = [('1', False, self.day, 4), ('5.2', True, self.day, 2)]
+        bulk_insert_entries(self.user, cells, [self.group.pk, self.other_group.pk], batch_size=3)
+        add_entry_counts(cells, [self.group.pk])
+        self.assertEqual(self.rollup()[(self.group.pk, '1', False, date(2024, 2, 1))], 8)
+        self.assertRollupMatchesRebuild()
+
+        add_entry_counts([('1', False, self.day, 1)], [self.group.pk], replace=True)
+        self.assertEqual(self.rollup()[(self.group.pk, '1', False, date(2024, 2, 1))], 5)
+        # Only the individual entries are left for Group 5.2
+        self.assertEqual(self.rollup()[(self.group.pk, '5.2', True, date(2024, 2, 1))], 2)
+        self.assertRollupMatchesRebuild()
+
+    def test_rebuild_command(self):
+        entry = Entry.objects.create(classification='3', date=self.day)
+        entry.groups.add(self.group)
+        EntryRollup.objects.all().delete()
+
+        call_command('rebuild_rollup', stdout=StringIO())
+
+        self.assertEqual(self.rollup(), {(self.group.pk, '3', False, date(2024, 2, 1)): 1})
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='analystpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        Entry.objects.create(classification='1').groups.add(self.group)
+
+    def etag(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag, **params):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_poll_skips_main_query(self):
+        etag = self.etag('/survey/entries/')
+
+        # Only the group data versions are read
+        with self.assertNumQueries(1):
+            self.assertNotModified('/survey/entries/', etag)
+
+        self.assertNotEqual(self.etag('/survey/entries/', page_size=10), etag)
+        for url in (reverse('survey:report'), reverse('survey:series'), reverse('survey:entry-counts'),
+                    f'/survey/entries/filter/group-{self.group.pk}/'):
+            self.assertNotModified(url, self.etag(url))
+
+    def test_changes_invalidate_etag(self):
+        url = reverse('survey:report')
+        etag = self.etag(url)
+
+        Entry.objects.create(classification='2').groups.add(self.other_group)
+        self.assertNotModified(url, etag)
+
+        add_entry_counts([('3', False, datetime(2024, 2, 1, tzinfo=dt_timezone.utc), 2)], [self.group.pk])
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        # The version is bumped once the membership change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.create(user=User.objects.create_user(username='new'), group=self.group)
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        Filter.objects.create(name='Network', user=self.user).groups.add(self.group)
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_changes_shown_in_entry_lists_invalidate_etag(self):
+        entry = Entry.objects.create(classification='2', user=self.user)
+        entry.groups.add(self.group, self.other_group)
+        url = '/survey/entries/'
+
+        etag = self.etag(url)
+        self.other_group.name = 'Renamed Hospital'
+        self.other_group.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        entry.groups.remove(self.other_group)
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+        # Logging in does not change anything the lists show
+        etag = self.etag(url)
+        self.user.save(update_fields=['last_login'])
+        self.assertNotModified(url, etag)
+
+
+class FilterComparisonTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        self.north = Group.objects.create(name='North Hospital')
+        self.south = Group.objects.create(name='South Hospital')
+        self.empty = Group.objects.create(name='Empty Hospital')
+        self.hidden = Group.objects.create(name='Hidden Hospital')
+        for group in (self.north, self.south, self.empty):
+            UserProfile.objects.create(user=self.user, group=group)
+        self.client.force_authenticate(user=self.user)
+
+        self.filter = Filter.objects.create(name='Network', user=self.user)
+        self.filter.groups.set([self.north, self.south, self.empty, self.hidden])
+
+        day = datetime(2024, 2, 1, tzinfo=dt_timezone.utc)
+        add_entry_counts([('1', False, day, 6), ('1', True, day, 2)], [self.north.pk])
+        add_entry_counts([('1', False, day, 1), ('1', True, day, 1), ('5.1', True, day, 4)], [self.south.pk])
+        add_entry_counts([('1', True, day, 50)], [self.hidden.pk])
+        bulk_insert_entries(self.user, [('5.1', False, day, 2)], [self.north.pk])
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = group_classification_counts([self.north.pk, self.south.pk, self.empty.pk])
+
+        self.assertEqual(counts, [
+            (self.empty.pk, 'Empty Hospital', {}),
+            (self.north.pk, 'North Hospital', {'1': (8, 2), '5.1': (2, 0)}),
+            (self.south.pk, 'South Hospital', {'1': (2, 1), '5.1': (4, 4)}),
+        ])
+
+    def test_comparison_against_network(self):
+        response = self.client.get(reverse('survey:filter-comparison', args=[self.filter.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        network = response.data['network']
+        self.assertEqual((network['births'], network['csections']), (16, 7))
+        self.assertEqual(network['csection_rate'], 43.75)
+
+        hospitals = {hospital['name']: hospital for hospital in response.data['hospitals']}
+        self.assertEqual(list(hospitals), ['Empty Hospital', 'North Hospital', 'South Hospital'])
+        self.assertEqual(hospitals['North Hospital']['csection_rate'], 20.0)
+        self.assertEqual(hospitals['North Hospital']['csection_rate_deviation'], -23.75)
+        self.assertIsNone(hospitals['Empty Hospital']['csection_rate_deviation'])
+
+        group_1 = hospitals['South Hospital']['rows'][0]
+        self.assertEqual((group_1['births'], group_1['csections']), (2, 1))
+        self.assertEqual(group_1['csection_rate_deviation'], 20.0)
+
+    def test_unknown_filter(self):
+        other = Filter.objects.create(name='Someone else', user=User.objects.create_user(username='other'))
+        response = self.client.get(reverse('survey:filter-comparison', args=[other.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ClassificationSeriesTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='analystpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('survey:series')
+
+        cells = [
+            ('1', True, datetime(2024, 1, 3, 10, tzinfo=dt_timezone.utc), 2),
+            ('1', False, datetime(2024, 1, 31, 10, tzinfo=dt_timezone.utc), 1),
+            ('3', False, datetime(2024, 4, 2, 10, tzinfo=dt_timezone.utc), 4),
+            ('3', True, datetime(2024, 7, 15, 10, tzinfo=dt_timezone.utc), 1),
+        ]
+        bulk_insert_entries(self.user, cells[:2], [self.group.pk])
+        add_entry_counts(cells[2:], [self.group.pk])
+
+    def series(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['series']
+
+    def test_monthly_series_is_zero_filled(self):
+        series = self.series(granularity='month')
+
+        self.assertEqual([point['label'] for point in series],
+                         ['2024-01', '2024-02', '2024-03', '2024-04', '2024-05', '2024-06', '2024-07'])
+        self.assertEqual([point['births'] for point in series], [3, 0, 0, 4, 0, 0, 1])
+        self.assertEqual(series[0]['csections'], 2)
+        self.assertEqual(series[0]['classifications']['1'], {'births': 3, 'csections': 2})
+        self.assertEqual(series[1]['classifications']['1'], {'births': 0, 'csections': 0})
+        self.assertIsNone(series[1]['csection_rate'])
+
+    def test_fiscal_quarters_and_weeks(self):
+        series = self.series(granularity='quarter', start_date='2023-12-01', end_date='2024-09-30')
+        self.assertEqual([point['label'] for point in series], [
+            'Quarter 2: 1st October 2023 - 31st December 2023',
+            'Quarter 3: 1st January 2024 - 31st March 2024',
+            'Quarter 4: 1st April 2024 - 30th June 2024',
+            'Quarter 1: 1st July 2024 - 30th September 2024',
+        ])
+        self.assertEqual([point['births'] for point in series], [0, 3, 4, 1])
+
+        series = self.series(granularity='week', start_date='2024-01-01', end_date='2024-01-31')
+        self.assertEqual(len(series), 5)
+        self.assertEqual(series[0]['period'], date(2024, 1, 1))
+        self.assertEqual(series[0]['label'], '2024-W01')
+        self.assertEqual([point['births'] for point in series], [2, 0, 0, 0, 1])
+
+    def test_rejects_unknown_granularity(self):
+        response = self.client.get(self.url, {'granularity': 'day'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_ranges_beyond_the_period_cap(self):
+        params = {'granularity': 'week', 'start_date': '2000-01-01', 'end_date': '2024-12-31'}
+        # Memberships and the ETag's group versions, but no rollup query
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Open ranges are capped by the span of the data
+        bulk_insert_entries(self.user, [('1', False, datetime(1990, 1, 1, tzinfo=dt_timezone.utc), 1)],
+                            [self.group.pk])
+        response = self.client.get(self.url, {'granularity': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        params['granularity'] = 'quarter'
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['series']), 100)
+
+
+class QueryPlanTests(APITestCase):
+    # SQLite reports full scans as "SCAN <table>", PostgreSQL as "Seq Scan on <table>"
+    FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)|\bSeq Scan on ')
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='seed')
+        groups = Group.objects.bulk_create([Group(name=f'Hospital {index}') for index in range(20)])
+        for index, group in enumerate(groups):
+            Filter.objects.create(name=f'Network {index}', user=user).groups.add(group)
+            cells = [
+                (classification, index % 2 == 0, datetime(2023, month, 1, tzinfo=dt_timezone.utc), 5)
+                for classification, _ in Entry.CLASSIFICATIONS
+                for month in (1, 4, 7, 10)
+            ]
+            bulk_insert_entries(user, cells, [group.pk])
+            add_entry_counts(cells, [group.pk])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.group_ids = [groups[0].pk, groups[1].pk]
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(self.FULL_SCAN.search(plan), plan)
+
+    def test_entry_queries_use_indexes(self):
+        entries = entries_for_groups(self.group_ids).filter(
+            date__gte=datetime(2023, 3, 1, tzinfo=dt_timezone.utc),
+            date__lte=datetime(2023, 9, 1, tzinfo=dt_timezone.utc),
+        ).order_by('date', 'id')
+        self.assertNoFullScan(entries)
+        self.assertNoFullScan(entries.filter(date__gt=datetime(2023, 4, 1, tzinfo=dt_timezone.utc))[:100])
+
+    def test_count_queries_use_indexes(self):
+        self.assertNoFullScan(EntryCount.objects.filter(group__in=self.group_ids, period__gte=date(2023, 3, 1)))
+        self.assertNoFullScan(
+            EntryRollup.objects.filter(group__in=self.group_ids, day__gte=date(2023, 3, 1))
+            .values('classification').order_by()
+        )
+        self.assertEqual(classification_counts(self.group_ids)['1'], (80, 40))
+
+    def test_name_lookups_use_indexes(self):
+        for model in (Group, Filter):
+            queryset = model.objects.alias(name_lower=Lower('name')).filter(name_lower=Lower(Value('HOSPITAL 3')))
+            self.assertNoFullScan(queryset)
+        self.assertTrue(Group.objects.alias(name_lower=Lower('name')).filter(
+            name_lower=Lower(Value('HOSPITAL 3'))).exists())
+
+
+class EntryDetailTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+
+        self.shared = Entry.objects.create(classification='1')
+        self.shared.groups.set([self.group, self.other_group])
+        self.hidden = Entry.objects.create(classification='2')
+        self.hidden.groups.set([self.other_group])
+
+    def test_entry_readable_through_any_viewable_group(self):
+        response = self.client.get(f'/survey/entries/{self.shared.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['classification'], '1')
+
+        response = self.client.get(f'/survey/entries/{self.hidden.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        for profile in UserProfile.objects.filter(user=self.user):
+            profile.can_view = False
+            profile.save()
+        response = self.client.get(f'/survey/entries/{self.shared.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class EntryPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='readerpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.second_group = Group.objects.create(name='Second Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        UserProfile.objects.create(user=self.user, group=self.second_group)
+        self.client.force_authenticate(user=self.user)
+
+        # Several entries share a timestamp so the id tie-breaker matters
+        dates = [datetime(2024, 1, day // 3 + 1, tzinfo=dt_timezone.utc) for day in range(25)]
+        entries = Entry.objects.bulk_create([
+            Entry(classification='1', user=self.user, date=entry_date) for entry_date in reversed(dates)
+        ])
+        for entry in entries:
+            entry.groups.set([self.group, self.second_group])
+        self.expected = [entry.pk for entry in sorted(entries, key=lambda entry: (entry.date, entry.pk))]
+
+    def walk(self, url):
+        ids = []
+        params = {'page_size': 7}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(entry['id'] for entry in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    def test_pages_cover_every_entry_once_in_order(self):
+        self.assertEqual(self.walk('/survey/entries/'), self.expected)
+        self.assertEqual(self.walk(f'/survey/entries/filter/group-{self.group.pk}/'), self.expected)
+
+    def test_page_query_count_is_constant(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/survey/entries/', {'page_size': 3})
+        # The second page reuses the cached memberships
+        with self.assertNumQueries(3):
+            self.client.get(response.data['next'])
+
+    def test_unpaginated_without_parameters(self):
+        response = self.client.get('/survey/entries/')
+        self.assertEqual([entry['id'] for entry in response.data], self.expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/survey/entries/', {'cursor': 'bm9wZQ=='})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FilterEntriesByDateTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='readerpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.second_group = Group.objects.create(name='Second Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        UserProfile.objects.create(user=self.user, group=self.second_group)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/survey/filter-entries-by-date/'
+
+    def create_entries(self, count):
+        entries = Entry.objects.bulk_create([
+            Entry(classification='2', user=self.user, date=datetime(2024, 1, 1 + index % 28, tzinfo=dt_timezone.utc))
+            for index in range(count)
+        ])
+        through = Entry.groups.through
+        through.objects.bulk_create([
+            through(entry_id=entry.pk, group_id=group.pk)
+            for entry in entries for group in (self.group, self.second_group)
+        ])
+
+    def fetch(self, data=None):
+        response = self.client.post(self.url, data or {})
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))['entries']
+
+    def test_streams_entries_with_groups(self):
+        self.create_entries(30)
+        entries = self.fetch({'start_date': '2024-01-05', 'end_date': '2024-01-06'})
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['user'], 'reader')
+        self.assertEqual(entries[0]['groups'], ['Test Hospital', 'Second Hospital'])
+        self.assertEqual(entries[0]['date'], '2024-01-05T00:00:00+00:00')
+
+    def test_query_count_does_not_grow_with_entries(self):
+        self.create_entries(5)
+        self.fetch()
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(len(self.fetch()), 5)
+
+        self.create_entries(500)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.fetch()), 505)
+
+        self.assertEqual(len(small), len(large))
+
+
+class DownloadSurveyCSVTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='readerpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.hidden_group = Group.objects.create(name='Hidden Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/survey/download-survey-csv/'
+        self.storage = use_temp_storage(self)
+
+    def create_entries(self, count, group):
+        cells = [('4', True, datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc), count)]
+        bulk_insert_entries(self.user, cells, [group.pk])
+
+    def fetch(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_streams_viewable_entries(self):
+        self.create_entries(3, self.group)
+        self.create_entries(2, self.hidden_group)
+
+        rows = self.fetch()
+
+        self.assertEqual(rows[0], ['id', 'classification', 'user', 'csection', 'date', 'groups'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][1:], ['4', 'reader', 'True', '2024-03-01 12:00:00+00:00', 'Test Hospital'])
+
+    def test_query_count_does_not_grow_with_entries(self):
+        # Warms the membership cache; each write below is an export cache miss
+        self.fetch()
+        self.create_entries(5, self.group)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(len(self.fetch()), 6)
+
+        self.create_entries(3000, self.group)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.fetch()), 3006)
+
+        # One extra chunk, two queries
+        self.assertEqual(len(large), len(small) + 2)
+
+    def test_cached_until_the_group_changes(self):
+        self.create_entries(3, self.group)
+        before = export_cache_stats()
+        first = self.fetch()
+
+        # Only the data version lookup on a hit
+        with self.assertNumQueries(1):
+            self.assertEqual(self.fetch(), first)
+
+        self.create_entries(1, self.hidden_group)
+        self.assertEqual(self.fetch(), first)
+        self.create_entries(1, self.group)
+        self.assertEqual(len(self.fetch()), 5)
+
+        stats = export_cache_stats()
+        self.assertEqual(stats['hits'] - before['hits'], 2)
+        self.assertEqual(stats['misses'] - before['misses'], 2)
+        self.assertEqual(stats['files'], 2)
+
+    def test_miss_streams_while_caching(self):
+        self.create_entries(3000, self.group)
+        cache_dir = self.storage / 'export_cache'
+
+        response = self.client.get(self.url)
+        self.assertNotIsInstance(response, FileResponse)
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'id,classification'))
+        # Nothing is cached until the last chunk has been written
+        self.assertEqual([path.suffix for path in cache_dir.iterdir()], ['.partial'])
+
+        rest = b''.join(chunks)
+        self.assertEqual(len(rest.splitlines()), 3000)
+        self.assertEqual([path.suffix for path in cache_dir.iterdir()], ['.csv'])
+        self.assertIsInstance(self.client.get(self.url), FileResponse)
+
+    def test_abandoned_download_leaves_no_partial_file(self):
+        self.create_entries(3000, self.group)
+        response = self.client.get(self.url)
+        next(iter(response.streaming_content))
+        response.close()
+
+        self.assertEqual(list((self.storage / 'export_cache').iterdir()), [])
+
+    def test_renaming_a_group_invalidates_its_exports(self):
+        stale = Group.objects.get(pk=self.group.pk)
+        self.create_entries(1, self.group)
+        self.fetch()
+        version = Group.objects.get(pk=self.group.pk).data_version
+
+        # Saving an instance loaded before the entries were added bumps
+        # the version rather than writing back its old one
+        stale.name = 'Renamed Hospital'
+        stale.save()
+
+        self.assertEqual(Group.objects.get(pk=self.group.pk).data_version, version + 1)
+        self.assertEqual(self.fetch()[1][-1], 'Renamed Hospital')
+
+    def test_changes_to_shared_groups_invalidate_exports(self):
+        cells = [('4', True, datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc), 1)]
+        bulk_insert_entries(self.user, cells, [self.group.pk, self.hidden_group.pk])
+        self.assertEqual(self.fetch()[1][-1], 'Test Hospital, Hidden Hospital')
+
+        # Neither change touches the exported group itself
+        self.hidden_group.name = 'Renamed Hospital'
+        self.hidden_group.save()
+        self.assertEqual(self.fetch()[1][-1], 'Test Hospital, Renamed Hospital')
+
+        third_group = Group.objects.create(name='Third Hospital')
+        third_group.entries.add(*Entry.objects.all())
+        self.assertEqual(self.fetch()[1][-1], 'Test Hospital, Renamed Hospital, Third Hospital')
+
+        third_group.entries.clear()
+        self.assertEqual(self.fetch()[1][-1], 'Test Hospital, Renamed Hospital')
+
+    def test_eviction_sweeps_stale_partial_files(self):
+        cache_dir = self.storage / 'export_cache'
+        cache_dir.mkdir()
+        stale, active = cache_dir / 'crashed.partial', cache_dir / 'writing.partial'
+        stale.write_bytes(b'id,')
+        active.write_bytes(b'id,')
+        os.utime(stale, (0, 0))
+
+        evict_exports()
+
+        self.assertFalse(stale.exists())
+        self.assertTrue(active.exists())
+
+    def test_evicts_least_recently_used(self):
+        self.create_entries(3, self.group)
+        self.fetch()
+        self.create_entries(1, self.group)
+        self.fetch()
+        old, recent = sorted((self.storage / 'export_cache').iterdir(), key=lambda path: path.stat().st_mtime)
+        os.utime(old, (0, 0))
+
+        evict_exports(max_bytes=recent.stat().st_size)
+
+        self.assertFalse(old.exists())
+        self.assertTrue(recent.exists())
+
+    def test_compressed_formats(self):
+        self.create_entries(3, self.group)
+        rows = self.fetch()
+
+        response = self.client.get(self.url, {'format': 'csv.gz'})
+        self.assertIn('survey_data.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(list(csv.reader(StringIO(content))), rows)
+
+        response = self.client.get(self.url, {'format': 'ndjson.gz'})
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        entries = [json.loads(line) for line in lines]
+        self.assertEqual([entry['id'] for entry in entries], [int(row[0]) for row in rows[1:]])
+        self.assertEqual(entries[0]['groups'], ['Test Hospital'])
+
+        response = self.client.get(self.url, {'format': 'quarterly'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(ExportJob.PARQUET in available_formats(), 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        # More than one chunk of entries, so more than one row group
+        self.create_entries(CHUNK_SIZE + 5, self.group)
+        rows = self.fetch()
+
+        response = self.client.get(self.url, {'format': 'parquet'})
+        self.assertIn('survey_data.parquet', response['Content-Disposition'])
+        frame = pd.read_parquet(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(list(frame.columns), rows[0])
+        self.assertEqual(frame['id'].tolist(), [int(row[0]) for row in rows[1:]])
+        self.assertEqual(set(frame['classification']), {'4'})
+        self.assertTrue(frame['csection'].all())
+        self.assertEqual(frame['user'].iloc[-1], 'reader')
+        self.assertEqual(list(frame['groups'].iloc[0]), ['Test Hospital'])
+
+    @skipIf(ExportJob.PARQUET in available_formats(), 'pyarrow is installed')
+    def test_parquet_needs_an_engine(self):
+        self.create_entries(3, self.group)
+        response = self.client.get(self.url, {'format': 'parquet'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_email_attachment(self):
+        self.create_entries(2, self.group)
+
+        response = self.client.get(self.url, {'email': 'coordinator@example.com'})
+
+        # Queued for the export worker rather than sent in the request
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('process_export_jobs', '--once', stdout=StringIO())
+
+        self.assertEqual(mail.outbox[0].to, ['coordinator@example.com'])
+        filename, content, _ = mail.outbox[0].attachments[0]
+        self.assertEqual(filename, 'survey_data.csv')
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_invalid_email_is_rejected(self):
+        response = self.client.get(self.url, {'email': 'not-an-email'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ExportJob.objects.exists())
+
+
+class ExportJobTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        self.other_user = User.objects.create_user(username='other', password='otherpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.hidden_group = Group.objects.create(name='Hidden Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/survey/exports/'
+        use_temp_storage(self)
+
+        for day in (1, 15):
+            cells = [('4', True, datetime(2024, 3, day, 12, tzinfo=dt_timezone.utc), 2)]
+            bulk_insert_entries(self.user, cells, [self.group.pk])
+        bulk_insert_entries(self.user, [('1', False, datetime(2024, 3, 1, tzinfo=dt_timezone.utc), 5)],
+                            [self.hidden_group.pk])
+
+    def run_worker(self):
+        call_command('process_export_jobs', '--once', stdout=StringIO())
+
+    def test_csv_export_is_built_by_the_worker(self):
+        response = self.client.post(self.url, {'format': 'csv', 'start_date': '2024-03-10'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ExportJob.QUEUED)
+        self.assertIsNone(response.data['download_url'])
+
+        download = reverse('survey:export-download', args=[response.data['id']])
+        self.assertEqual(self.client.get(download).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.run_worker()
+
+        job = self.client.get(reverse('survey:export-job', args=[response.data['id']])).data
+        self.assertEqual(job['status'], ExportJob.DONE)
+        self.assertEqual(job['row_count'], 2)
+        self.assertTrue(job['download_url'].endswith(download))
+
+        response = self.client.get(download)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('survey_data.csv', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row[4].startswith('2024-03-15') for row in rows[1:]))
+
+    def test_row_count_of_a_cached_export(self):
+        first = self.client.post(self.url, {'format': 'csv'}).data['id']
+        self.run_worker()
+        second = self.client.post(self.url, {'format': 'csv'}).data['id']
+        self.run_worker()
+
+        self.assertEqual(export_cache_stats()['files'], 1)
+        self.assertEqual(list(ExportJob.objects.filter(pk__in=[first, second]).values_list('row_count', flat=True)),
+                         [4, 4])
+
+    def test_old_jobs_and_their_files_are_expired(self):
+        old = self.client.post(self.url).data['id']
+        self.run_worker()
+        old_file = Path(ExportJob.objects.get(pk=old).file.path)
+        ExportJob.objects.filter(pk=old).update(finished_on=datetime.now(dt_timezone.utc) - timedelta(days=8))
+        recent = self.client.post(self.url).data['id']
+
+        # The worker sweeps once its queue is empty
+        output = StringIO()
+        call_command('process_export_jobs', '--once', stdout=output)
+        self.assertIn('Deleted 1 expired export jobs', output.getvalue())
+        self.assertFalse(old_file.exists())
+        self.assertEqual(expire_export_jobs(), 0)
+        self.assertEqual(list(ExportJob.objects.values_list('pk', flat=True)), [recent])
+        self.assertTrue(Path(ExportJob.objects.get(pk=recent).file.path).exists())
+
+    def test_quarterly_export(self):
+        response = self.client.post(self.url, {'format': 'quarterly', 'group': self.group.pk})
+        self.run_worker()
+
+        response = self.client.get(reverse('survey:export-download', args=[response.data['id']]))
+        ws = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(ws['A1'].value, 'Group Robson')
+
+    def test_quarterly_export_without_groups_is_the_blank_template(self):
+        response = self.client.post(self.url, {'format': 'quarterly'})
+        self.assertEqual(list(ExportJob.objects.get(pk=response.data['id']).groups.all()), [])
+
+    def test_groups_no_longer_viewable_are_dropped_when_the_job_runs(self):
+        other_group = Group.objects.create(name='Other Hospital')
+        UserProfile.objects.create(user=self.user, group=other_group)
+        bulk_insert_entries(self.user, [('2', False, datetime(2024, 3, 1, tzinfo=dt_timezone.utc), 3)],
+                            [other_group.pk])
+        first = self.client.post(self.url).data['id']
+        second = self.client.post(self.url, {'group': other_group.pk}).data['id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.filter(user=self.user, group=other_group).delete()
+        self.run_worker()
+
+        job = ExportJob.objects.get(pk=first)
+        self.assertEqual(job.status, ExportJob.DONE)
+        self.assertEqual(job.row_count, 4)
+        job = ExportJob.objects.get(pk=second)
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertFalse(job.file)
+
+    def test_rejects_bad_requests(self):
+        for data in ({'format': 'pdf'}, {'start_date': 'March'}, {'email': 'not-an-email'}):
+            response = self.client.post(self.url, data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'group': self.hidden_group.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_jobs_are_private_to_their_user(self):
+        job_id = self.client.post(self.url).data['id']
+        self.run_worker()
+
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(reverse('survey:export-job', args=[job_id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('survey:export-download', args=[job_id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+class QuarterlyXLSXTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='coordinator', password='coordinatorpass')
+        self.group = Group.objects.create(name='Test Hospital')
+        self.hidden_group = Group.objects.create(name='Hidden Hospital')
+        UserProfile.objects.create(user=self.user, group=self.group)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/survey/generate-quarterly-xlsx/'
+        use_temp_storage(self)
+
+        # Q1 and Q3 of the last complete July-June year
+        start_year = date.today().year - (1 if date.today().month >= 7 else 2)
+        q1 = datetime(start_year, 8, 1, tzinfo=dt_timezone.utc)
+        q3 = datetime(start_year + 1, 2, 1, tzinfo=dt_timezone.utc)
+        self.quarter_label = fiscal_quarter_label(date(start_year, 7, 1))
+        bulk_insert_entries(self.user, [('1', False, q1, 2), ('1', True, q1, 1)], [self.group.pk])
+        add_entry_counts([('5.2', True, q3, 7), ('1', False, q3, 3)], [self.group.pk])
+        add_entry_counts([('1', False, q1, 40)], [self.hidden_group.pk])
+
+    def sheet(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return load_workbook(BytesIO(b''.join(response.streaming_content))).active
+
+    def test_filled_from_group_counts(self):
+        # Memberships, data versions and the counts; later requests hit the export cache
+        with self.assertNumQueries(3):
+            b''.join(self.client.get(self.url, {'group': self.group.pk}).streaming_content)
+        ws = self.sheet(group=self.group.pk)
+
+        self.assertEqual(ws['B1'].value, self.quarter_label)
+        self.assertIn('B1:C1', [str(merged) for merged in ws.merged_cells.ranges])
+        self.assertEqual([ws[f'{col}3'].value for col in 'ABCDEFGHI'], ['Group 1', 2, 1, 0, 0, 3, 0, 0, 0])
+        self.assertEqual(ws['G8'].value, 7)
+        self.assertEqual(ws['J3'].value, '=SUMPRODUCT(B3:I3, --ISEVEN(COLUMN(B3:I3)))')
+        self.assertEqual(ws['K15'].value, '=SUM(K3:K14)')
+
+        # Parsing the sheet back gives the same births
+        cells = list(parse_quarterly_rows(ws.iter_rows(values_only=True)))
+        self.assertEqual(sum(count for _, _, _, count in cells), 13)
+
+    def test_blank_template_and_hidden_groups(self):
+        ws = self.sheet()
+        self.assertEqual([ws[f'{col}3'].value for col in 'BCDEFGHI'], [0] * 8)
+
+        response = self.client.get(self.url, {'group': self.hidden_group.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
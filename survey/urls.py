@@ -7,9 +7,20 @@ urlpatterns = [
     path('entries/', EntryListView.as_view()),
     path('entries/filter/<str:pk>/', EntryFilterListView.as_view()),
     path('entries/upload/', EntryListView.as_view(), name='entry-upload'),
+    path('entries/matrix/', EntryCountMatrixView.as_view(), name='entry-matrix'),
     path('entries/<int:pk>/', EntryDetailView.as_view()),
+    path('entry-counts/', EntryCountListView.as_view(), name='entry-counts'),
+    path('entry-counts/filter/<str:pk>/', EntryCountFilterListView.as_view(), name='entry-counts-filter'),
+    path('upload-jobs/<int:pk>/', UploadJobDetailView.as_view(), name='upload-job'),
+    path('exports/', ExportJobCreateView.as_view(), name='exports'),
+    path('exports/<int:pk>/', ExportJobDetailView.as_view(), name='export-job'),
+    path('exports/<int:pk>/download/', ExportJobDownloadView.as_view(), name='export-download'),
+    path('export-cache-stats/', ExportCacheStatsView.as_view(), name='export-cache-stats'),
+    path('report/', RobsonReportView.as_view(), name='report'),
+    path('series/', ClassificationSeriesView.as_view(), name='series'),
     path('filters/', FilterConfigurationListCreateView.as_view()),
     path('filters/<int:pk>/', FilterConfigurationDetailView.as_view()),
+    path('filters/<int:pk>/comparison/', FilterComparisonView.as_view(), name='filter-comparison'),
     path('create-configuration/', CreateConfiguration.as_view(), name = 'create-configuration'),
     path('remove-group-from-configuration/', RemoveGroupFromConfiguration.as_view()),
     path('add-group-to-configuration/', AddGroupToConfiguration.as_view()),
@@ -1,53 +1,104 @@
-import csv
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
 
-from django.http import HttpResponse, JsonResponse
-from django.core.mail import EmailMessage
+from django.core.files.storage import default_storage
+from django.core.validators import validate_email
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.authtoken.views import APIView
 
-import pandas as pd
 import os
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Alignment, Font
-from openpyxl.utils import get_column_letter
-
-from datetime import datetime, timedelta
-import re
-from .serializers import EntrySerializer, FilterSerializer
-from .models import Entry, Filter
-from .permissions import CanReadEntry
-from users.models import Group, UserProfile
 
-class EntryListView(generics.ListCreateAPIView):
+from datetime import datetime
+from .serializers import (
+    CountMatrixSerializer, EntryCountSerializer, EntrySerializer, ExportJobSerializer, FilterSerializer,
+    UploadJobSerializer,
+)
+from .models import Entry, EntryCount, ExportJob, Filter, UploadJob
+from .conditional import GroupVersionETagMixin
+from .export_cache import export_cache_stats, export_response
+from .exports import EXPORT_FILES, available_formats
+from .ingest import SHEET_EXTENSIONS, HashingFile, add_entry_counts, bulk_insert_entries
+from .jobs import find_duplicate_upload, queue_export_job
+from .pagination import EntryKeysetPagination
+from .permissions import CanReadEntry
+from .reports import (
+    GRANULARITIES, classification_counts, classification_series, compare_groups, group_classification_counts,
+    parse_date_range, robson_table,
+)
+from .scopes import (
+    entries_for_groups, params_group_ids, quarterly_group_ids, scope_group_ids, viewable_group_ids,
+)
+from .streaming import stream_entries_json
+from users.memberships import get_memberships
+from users.models import Group
+
+class EntryListView(GroupVersionETagMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EntrySerializer
 
-    def get_queryset(self):
-        user_profiles = UserProfile.objects.filter(
-            user=self.request.user
-        ).filter(Q(can_view=True) | Q(is_admin=True))
-        allowed_groups = user_profiles.values_list('group', flat=True)
-        return Entry.objects.filter(groups__in=allowed_groups).distinct()
+    pagination_class = EntryKeysetPagination
 
-    def perform_create(self, serializer):
-        # Fetch all user profiles where the user has can_add permissions
-        user_profiles = UserProfile.objects
-        if not user_profiles.exists():
+    def get_etag_group_ids(self):
+        return viewable_group_ids(self.request)
+
+    def get_queryset(self):
+        allowed_groups = viewable_group_ids(self.request)
+        return entries_for_groups(allowed_groups).select_related(
+            'user'
+        ).prefetch_related('groups').order_by('date', 'id')
+
+    def get_entry_groups(self):
+        # New entries are shared with every group their author may add to
+        group_ids = get_memberships(self.request).addable_group_ids()
+        if not group_ids:
             raise PermissionDenied("You do not have permission to add entries to any group.")
+        return group_ids
 
-        # Collect all groups the user can add to
-        allowed_groups = user_profiles.values_list('group', flat=True)
+    def perform_create(self, serializer):
+        group_ids = self.get_entry_groups()
 
         # Save the entry and associate it with all allowed groups
         entry = serializer.save(user=self.request.user)
-        entry.groups.set(allowed_groups)
-
+        entry.groups.set(group_ids)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # A JSON array is validated in one pass and inserted as a single batch
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = [
+                {'index': index, 'errors': item_errors}
+                for index, item_errors in enumerate(serializer.errors)
+                if item_errors
+            ]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_ids = self.get_entry_groups()
+        cells = (
+            (
+                item['classification'],
+                item.get('csection', False),
+                item.get('date') or timezone.now(),
+                1,
+            )
+            for item in serializer.validated_data
+        )
+        stats = bulk_insert_entries(request.user, cells, group_ids)
+        return Response(
+            {'count': stats['count'], 'ids': stats['ids']},
+            status=status.HTTP_201_CREATED
+        )
 
     def post(self, request, *args, **kwargs):
         if 'file' in request.FILES:
@@ -56,86 +107,149 @@ class EntryListView(generics.ListCreateAPIView):
             return super().post(request, *args, **kwargs)
 
     def upload_file(self, file):
-        try:
-            _, file_extension = os.path.splitext(file.name)
-            df = pd.DataFrame()
-            if file_extension == '.csv':
-                with open(file, 'r') as file:
-                    lines = file.readlines()
+        _, file_extension = os.path.splitext(file.name)
+        if file_extension not in SHEET_EXTENSIONS + ('.zip',):
+            return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
-                start_row = next(i for i, line in enumerate(lines) if line.strip().lower().startswith("group"))
-                df = pd.read_csv(file, skiprows=start_row, header=None)
+        group_ids = get_memberships(self.request).addable_group_ids()
+        if not group_ids:
+            return Response(
+                {'error': 'You do not have permission to add data to any group.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
-            elif file_extension == '.xlsx':
-                workbook = load_workbook(file, read_only=True)
-                sheet = workbook.active
+        # Written to storage a chunk at a time and hashed on the way
+        upload = HashingFile(file)
+        stored_name = default_storage.save(UploadJob.upload.field.generate_filename(None, file.name), upload)
+        fingerprint = upload.sha256.hexdigest()
 
-                start_row = next(i for i, row in enumerate(sheet.iter_rows(values_only=True))
-                                if str(row[0]).strip().lower().startswith("group"))
-                df = pd.read_excel(file, skiprows=start_row, header=None)
-            i = 1
-            count = 0
+        # Re-sending a sheet whose quarters nothing has replaced since would change nothing
+        duplicate = find_duplicate_upload(fingerprint, group_ids)
+        if duplicate is not None:
+            default_storage.delete(stored_name)
+            return Response(
+                {'error': 'This file has already been uploaded.', 'id': duplicate.pk},
+                status=status.HTTP_409_CONFLICT
+            )
 
-            try:
-                if df.iat[0, i][:7] != "Quarter":
-                    raise Exception
-            except:
-                return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-
-            while df.iat[0, i][:7] == "Quarter":
-                date = min(datetime.strptime(re.sub(r'(\d+)(st|nd|rd|th)', r'\1', df.iat[0, i].split("- ")[1]), '%d %B %Y'), datetime.now())
-                j = 2
-
-                try:
-                    if df.iat[j, 0][:5] != "Group":
-                        raise Exception
-                except:
-                    return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-
-                while df.iat[j, 0][:5] == "Group":
-                    v = df.iat[j, i]
-                    if not pd.isna(v):
-                        for k in range(df.iat[j, i]):
-                            self._create_entry(df.iat[j, 0].split(' ')[1], 'n', date)
-                            count += 1
-                    c = df.iat[j, i + 1]
-                    if not pd.isna(c):
-                        for k in range(df.iat[j, i + 1]):
-                            df.iat[j, 0].split(' ')[1], 'y', date
-                            self._create_entry(df.iat[j, 0].split(' ')[1], 'y', date)
-                            count += 1
-                    j += 1
-                i += 2
-            return Response({"message": f"{count} entries uploaded successfully."}, status=status.HTTP_201_CREATED)
+        try:
+            job = UploadJob.objects.create(
+                user=self.request.user,
+                filename=file.name,
+                upload=stored_name,
+                fingerprint=fingerprint,
+            )
+            job.groups.set(group_ids)
         except Exception as e:
+            default_storage.delete(stored_name)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _create_entry(self, classification, csection, date):
+        return Response(UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class EntryCountMatrixView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = CountMatrixSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        group_ids = get_memberships(request).addable_group_ids()
+        if not group_ids:
+            return Response(
+                {'error': 'You do not have permission to add data to any group.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Same replace-quarter semantics as spreadsheet uploads, minus the parsing
+        stats = add_entry_counts(serializer.validated_data['cells'], group_ids, replace=True)
+        return Response(
+            {
+                'message': f"{stats['count']} births recorded.",
+                'count': stats['count'],
+                'seconds': stats['seconds'],
+                'rows_per_second': stats['rows_per_second'],
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ExportJobCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        export_format = request.data.get('format', ExportJob.CSV)
+        if export_format not in available_formats():
+            return Response(
+                {'error': f"format must be one of: {', '.join(available_formats())}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            user = self.request.user
-            groups = UserProfile.objects.filter(user=user).values_list('group__name', flat=True).distinct()
-            entry_data = {
-                'classification': classification,
-                'csection': csection,
-                'date': date,
-                'group': groups,
-            }
-            serializer = self.get_serializer(data=entry_data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            start_date, end_date = parse_date_range(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        email = request.data.get('email', '')
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                return Response({'error': 'Invalid email'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if export_format == ExportJob.QUARTERLY:
+            # Same sheet as GenerateQuarterlyXLSX
+            group_ids = quarterly_group_ids(request, request.data)
+        else:
+            group_ids = params_group_ids(request, request.data)
+        job = queue_export_job(request.user, export_format, group_ids, start_date, end_date, email)
+        return Response(
+            ExportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ExportJobDetailView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ExportJobSerializer
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+
+class ExportJobDownloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+        if job.status != ExportJob.DONE or not job.file:
+            return Response({'error': 'Export is not ready'}, status=status.HTTP_404_NOT_FOUND)
+
+        filename, content_type = EXPORT_FILES[job.format]
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+
+class ExportCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(export_cache_stats(), status=status.HTTP_200_OK)
+
+
+class UploadJobDetailView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = UploadJobSerializer
+
+    def get_queryset(self):
+        return UploadJob.objects.filter(user=self.request.user)
 
 
 class FilterEntriesByDateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        current_user = request.user
+        user_groups = viewable_group_ids(request)
 
-        user_groups = UserProfile.objects.filter(user=current_user).values_list('group', flat=True)
-
-        if not user_groups.exists():
+        if not user_groups:
             return JsonResponse({'entries': []})
 
         start_date = request.POST.get('start_date', None)
@@ -152,44 +266,22 @@ class FilterEntriesByDateView(APIView):
         if end_date:
             end_date = datetime.combine(end_date, datetime.max.time())
         
-        if start_date and end_date:
-            entries = Entry.objects.filter(
-                date__range=(start_date, end_date),
-                groups__in=user_groups
-            ).distinct()
-        elif start_date:
-            entries = Entry.objects.filter(
-                date__gte=start_date,
-                groups__in=user_groups
-            ).distinct()
-        elif end_date:
-            entries = Entry.objects.filter(
-                date__lte=end_date,
-                groups__in=user_groups
-            ).distinct()
-        else:
-            entries = Entry.objects.filter(groups__in=user_groups).distinct()
-            
-        entries = entries.order_by('date')
-
-        entries_data = [
-            {
-                'id': entry.pk,
-                'classification': entry.classification,
-                'user': entry.user.username if entry.user else None,
-                'groups': [group.name for group in entry.groups.all()],
-                'csection': entry.csection,
-                'date': entry.date.isoformat(),
-            }
-            for entry in entries
-        ]
+        entries = entries_for_groups(user_groups)
+        if start_date:
+            entries = entries.filter(date__gte=start_date)
+        if end_date:
+            entries = entries.filter(date__lte=end_date)
 
-        return JsonResponse({'entries': entries_data})
+        return StreamingHttpResponse(stream_entries_json(entries), content_type='application/json')
 
 
-class EntryFilterListView(generics.ListAPIView):
+class EntryFilterListView(GroupVersionETagMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EntrySerializer
+    pagination_class = EntryKeysetPagination
+
+    def get_etag_group_ids(self):
+        return scope_group_ids(self.request, self.kwargs.get('pk'))
 
     def get_serializer(self, *args, **kwargs):
         # Exclude 'groups' field from the serializer
@@ -197,87 +289,152 @@ class EntryFilterListView(generics.ListAPIView):
         return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        pk = self.kwargs.get('pk')
+        group_ids = scope_group_ids(self.request, self.kwargs.get('pk'))
+        return entries_for_groups(group_ids).select_related('user').order_by('date', 'id')
 
-        # Determine if the pk is prefixed with 'filter-' or 'group-'
-        if pk.startswith('filter-'):
-            filter_id = pk.split('-')[1]
-            return self.get_entries_by_filter(filter_id)
-        elif pk.startswith('group-'):
-            group_id = pk.split('-')[1]
-            return self.get_entries_by_group(group_id)
-        else:
-            return Entry.objects.none()
 
-    def get_entries_by_filter(self, filter_id):
+class EntryCountListView(GroupVersionETagMixin, generics.ListAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = EntryCountSerializer
+
+    def get_etag_group_ids(self):
+        return viewable_group_ids(self.request)
+
+    def get_queryset(self):
+        return EntryCount.objects.filter(
+            group__in=viewable_group_ids(self.request)
+        ).order_by('period', 'group', 'classification', 'csection')
+
+
+class EntryCountFilterListView(EntryCountListView):
+
+    def get_etag_group_ids(self):
+        return scope_group_ids(self.request, self.kwargs.get('pk'))
+
+    def get_queryset(self):
+        group_ids = scope_group_ids(self.request, self.kwargs.get('pk'))
+        return EntryCount.objects.filter(
+            group__in=group_ids
+        ).order_by('period', 'group', 'classification', 'csection')
+
+class RobsonReportView(GroupVersionETagMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_etag_group_ids(self):
+        return params_group_ids(self.request)
+
+    def get(self, request):
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_ids = params_group_ids(request)
+        report = robson_table(classification_counts(group_ids, start_date, end_date))
+        report['groups'] = group_ids
+        report['start_date'] = start_date
+        report['end_date'] = end_date
+        return Response(report)
+
+
+class FilterComparisonView(GroupVersionETagMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_etag_group_ids(self):
+        return scope_group_ids(self.request, f"filter-{self.kwargs['pk']}")
+
+    def get(self, request, pk):
         try:
-            user_filter = Filter.objects.get(pk=filter_id, user=self.request.user)
-            user_profiles = UserProfile.objects.filter(
-                user=self.request.user
-            ).filter(Q(can_view=True) | Q(is_admin=True))
-            allowed_groups = user_profiles.values_list('group', flat=True)
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_ids = scope_group_ids(request, f'filter-{pk}')
+        if not group_ids and not Filter.objects.filter(pk=pk, user=request.user).exists():
+            return Response({'error': 'Filter not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        comparison = compare_groups(group_classification_counts(group_ids, start_date, end_date))
+        comparison['filter'] = pk
+        comparison['start_date'] = start_date
+        comparison['end_date'] = end_date
+        return Response(comparison)
+
 
-            groups_in_filter = user_filter.groups.filter(id__in=allowed_groups)
-            return Entry.objects.filter(groups__in=groups_in_filter).distinct()
+class ClassificationSeriesView(GroupVersionETagMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        except Filter.DoesNotExist:
-            return Entry.objects.none()
+    def get_etag_group_ids(self):
+        return params_group_ids(self.request)
 
-    def get_entries_by_group(self, group_id):
+    def get(self, request):
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            user_profiles = UserProfile.objects.filter(
-                user=self.request.user
-            ).filter(Q(can_view=True) | Q(is_admin=True), group__id=group_id)
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_ids = params_group_ids(request)
+        try:
+            series = classification_series(group_ids, granularity, start_date, end_date)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'granularity': granularity,
+            'groups': group_ids,
+            'start_date': start_date,
+            'end_date': end_date,
+            'series': series,
+        })
+
 
-            if not user_profiles.exists():
-                raise PermissionDenied("You do not have permission to view entries for this group.")
+class ExportFormatNegotiation(DefaultContentNegotiation):
 
-            return Entry.objects.filter(groups__id=group_id).distinct()
+    def filter_renderers(self, renderers, format):
+        # ?format= names the export file type rather than a renderer
+        return renderers
 
-        except Group.DoesNotExist:
-            return Entry.objects.none()
 
 class DownloadSurveyCSVView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EntrySerializer
+    content_negotiation_class = ExportFormatNegotiation
 
     def get(self, request):
-        try:
-            queryset = Entry.objects.filter(
-                user__in=UserProfile.objects.filter(
-                    group__in=UserProfile.objects.filter(
-                        user=request.user, can_view=True
-                    ).values_list('group', flat=True)
-                ).values_list('user', flat=True).distinct()
+        export_format = request.GET.get('format', ExportJob.CSV)
+        if export_format not in available_formats(entries_only=True):
+            return Response(
+                {'error': f"format must be one of: {', '.join(available_formats(entries_only=True))}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            model = queryset.model
-            model_fields = model._meta.fields + model._meta.many_to_many
-            field_names = [field.name for field in model_fields]
-
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="survey_data.csv"'
-            writer = csv.writer(response, delimiter=",")
-            writer.writerow(field_names)
-
-            for row in queryset:
-                values = [getattr(row, field) for field in field_names if field != "groups"]
-                group_names = ', '.join(row.groups.values_list('name', flat=True))
-                values.append(group_names)
-                writer.writerow(values)
-
-            recipient_email = request.GET.get('email')
+
+        recipient_email = request.GET.get('email')
+        if recipient_email:
+            try:
+                validate_email(recipient_email)
+            except ValidationError:
+                return Response({'error': 'Invalid email'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
             if recipient_email:
-                email = EmailMessage(
-                    subject='Survey Data CSV',
-                    body='Please see the attached survey data.',
-                    to=[recipient_email]
+                # The export worker builds and sends the file
+                job = queue_export_job(
+                    request.user, export_format, viewable_group_ids(request), email=recipient_email
+                )
+                return Response(
+                    {
+                        'message': f'The export will be emailed to {recipient_email} when it is ready.',
+                        'job': ExportJobSerializer(job, context={'request': request}).data,
+                    },
+                    status=status.HTTP_202_ACCEPTED
                 )
-                email.attach('survey_data.csv', response.getvalue(), 'text/csv')
-                email.send()
-
-                return Response({'message': 'CSV sent to email successfully!'}, status=status.HTTP_200_OK)
 
-            return response
+            # Served from the export cache until one of the groups changes
+            return export_response(export_format, viewable_group_ids(request))
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -289,9 +446,7 @@ class EntryDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
 
-        pk = self.kwargs.get('pk')
-        queryset = Entry.objects.get(pk=pk)
-        return queryset
+        return Entry.objects.select_related('user').prefetch_related('groups')
 
 
 class FilterConfigurationListCreateView(generics.ListCreateAPIView):
@@ -301,8 +456,7 @@ class FilterConfigurationListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user_filters = Filter.objects.filter(user=self.request.user)
         # Get groups the user has permission to view
-        user_profiles = UserProfile.objects.filter(user=self.request.user, can_view=True)
-        allowed_groups = user_profiles.values_list('group', flat=True)
+        allowed_groups = viewable_group_ids(self.request)
 
         # Include filters with no groups or with allowed groups
         return user_filters.filter(Q(groups__in=allowed_groups) | Q(groups__isnull=True)).distinct()
@@ -310,12 +464,9 @@ class FilterConfigurationListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         groups = serializer.validated_data.get('groups', [])
 
-        user_groups = Group.objects.filter(userprofile__user=self.request.user)
+        memberships = get_memberships(self.request)
 
-        user_profiles = UserProfile.objects.filter(user=self.request.user, can_view=True)
-        allowed_groups = user_profiles.values_list('group', flat=True)
-
-        if not all(group in allowed_groups for group in groups):
+        if not all(memberships.can_view(group.pk) for group in groups):
             raise PermissionDenied("You can only add groups you belong to.")
 
         serializer.save(user=self.request.user)
@@ -334,7 +485,7 @@ class CreateConfiguration(APIView):
             return Response({'error': 'Group name must be at least 5 characters'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            if Filter.objects.filter(name__iexact=configuration_name).exists():
+            if Filter.objects.alias(name_lower=Lower('name')).filter(name_lower=Lower(Value(configuration_name))).exists():
                 return Response({'error': 'A group with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
             configuration = Filter.objects.create(name=configuration_name, user=self.request.user)
@@ -406,111 +557,8 @@ class FilterConfigurationDetailView(generics.ListAPIView):
 class GenerateQuarterlyXLSX(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_quarters(self):
-        today = datetime.today()
-        current_year_start = datetime(today.year, 7, 1)
-        last_year_start = current_year_start - timedelta(days=365)
-
-        if today >= current_year_start:
-            start_date = last_year_start
-        else:
-            start_date = last_year_start - timedelta(days=365)
-
-        quarters = [
-            f"Quarter 1: 1st July {start_date.year} - 30th September {start_date.year}",
-            f"Quarter 2: 1st October {start_date.year} - 31st December {start_date.year}",
-            f"Quarter 3: 1st January {start_date.year + 1} - 31st March {start_date.year + 1}",
-            f"Quarter 4: 1st April {start_date.year + 1} - 30th June {start_date.year + 1}",
-        ]
-        return quarters
-
     def get(self, request):
-        quarters = self.get_quarters()
-
-        group_labels = [
-            "Group 1", "Group 2", "Group 3", "Group 4", "Group 5.1",
-            "Group 5.2", "Group 6", "Group 7", "Group 8", "Group 9", "Group 10"
-        ]
-
-        # Create workbook and sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Quarterly Data"
-
-        # Add headers
-        headers = ["Group Robson"] + quarters + ["Final", ""]
-        subheaders = [""] + ["Vaginal Delivery", "C/Section"] * (len(quarters) + 1)
-
-        ws.append(headers)
-        ws.append(subheaders)
-
-        ws.merge_cells(start_row=1, start_column=1, end_row=2, end_column=1)
-        ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-        ws["A1"].font = Font(bold=True)
-
-        # Merge each quarter header to span 2 columns
-        for i in range(len(quarters)):
-            # First merge quarter headers for each quarter (e.g., "Quarter 1: Vaginal Delivery" and "Quarter 1: C/Section")
-            ws.merge_cells(start_row=1, start_column=2 + i * 2, end_row=1, end_column=3 + i * 2)
-            ws.cell(row=1, column=2 + i * 2).value = quarters[i]
-            ws.cell(row=1, column=2 + i * 2).alignment = Alignment(horizontal="center", vertical="center")
-            ws.cell(row=1, column=2 + i * 2).font = Font(bold=True)
-
-        # Merge the "Final" header to span 2 columns
-        ws.merge_cells(start_row=1, start_column=len(quarters) * 2 + 2, end_row=1, end_column=len(quarters) * 2 + 3)
-        ws.cell(row=1, column=len(quarters) * 2 + 2).value = "Final"
-        ws.cell(row=1, column=len(quarters) * 2 + 2).alignment = Alignment(horizontal="center", vertical="center")
-        ws.cell(row=1, column=len(quarters) * 2 + 2).font = Font(bold=True)
-
-        # Style subheaders (Vaginal Delivery and C/Section)
-        for col in range(2, len(headers) * 2 + 1):
-            ws.cell(row=2, column=col).alignment = Alignment(horizontal="center", vertical="center")
-
-        # Process data rows
-        row_index = 3
-        for group in group_labels:
-            row = [group]
-            # Leave data cells blank (users will input data)
-            row.extend([0] * (len(quarters) * 2))
-            # Add formulas for "Final" columns
-            vaginal_formula = f"=SUMPRODUCT(B{row_index}:I{row_index}, --ISEVEN(COLUMN(B{row_index}:I{row_index})))"
-            csection_formula = f"=SUMPRODUCT(B{row_index}:I{row_index}, --ISODD(COLUMN(B{row_index}:I{row_index})))"
-            row.extend([vaginal_formula, csection_formula])
-            ws.append(row)
-            row_index += 1
-
-        # Add "No Record" row
-        ws.append(["No Record"] + [0] * (len(quarters) * 2) + [f"=SUMPRODUCT(B14:I14, --ISEVEN(COLUMN(B14:I14)))", f"=SUMPRODUCT(B14:I14, --ISODD(COLUMN(B14:I14)))"])
-        row_index += 1
-
-        # Add "Total" row with dynamic column formulas
-        total_row = ["Total"]
-        for col in range(2, len(headers) + 5):
-            col_letter = get_column_letter(col)
-            total_row.append(f"=SUM({col_letter}3:{col_letter}{row_index - 1})")
-        ws.append(total_row)
-
-        for col in range(1, len(headers) + 5):
-            cell = ws.cell(row=ws.max_row, column=col)
-            cell.font = Font(bold=True)
-
-        # Auto-size columns
-        for col in ws.columns:
-            max_length = 0
-            col_letter = get_column_letter(col[0].column)
-            for cell in col:
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except:
-                    pass
-            ws.column_dimensions[col_letter].width = max_length + 2
-
-        # Save the workbook to the response
-        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = 'attachment; filename="quarterly_survey_data.xlsx"'
-        wb.save(response)
-        return response
+        return export_response(ExportJob.QUARTERLY, quarterly_group_ids(request))
     
     
 class DeleteFilterView(APIView):
@@ -0,0 +1,113 @@
+import os
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+# Counted per process: a shared cache write on every request would cost
+# more than the query the cache saves
+CACHE_STATS = Counter()
+
+
+class Membership(NamedTuple):
+    can_view: bool
+    can_add: bool
+    is_admin: bool
+
+
+def membership_cache_key(user_id):
+    return f'memberships:{user_id}'
+
+
+def invalidate_memberships(user_id):
+    cache.delete(membership_cache_key(user_id))
+
+
+def cached_membership_rows(user):
+    """Return [(group id, can_view, can_add, is_admin)] for the user, from the cache when possible."""
+    key = membership_cache_key(user.pk)
+    rows = cache.get(key)
+    if rows is not None:
+        CACHE_STATS['hits'] += 1
+        return rows
+
+    CACHE_STATS['misses'] += 1
+    rows = list(UserProfile.objects.filter(user=user).values_list(
+        'group', 'can_view', 'can_add', 'is_admin'
+    ))
+    cache.set(key, rows, getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', 300))
+    return rows
+
+
+def membership_cache_stats():
+    """
+    Hit and miss counts for the process serving the request, tagged with
+    its pid. Under several workers each one reports only its own lookups.
+    """
+    hits, misses = CACHE_STATS['hits'], CACHE_STATS['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'pid': os.getpid(),
+    }
+
+
+class Memberships(dict):
+    """A user's UserProfile rows as {group id: Membership}, cached across requests."""
+
+    def __init__(self, user):
+        super().__init__()
+        self.user_id = user.pk
+        if user.is_authenticated:
+            for group_id, can_view, can_add, is_admin in cached_membership_rows(user):
+                self[group_id] = Membership(can_view, can_add, is_admin)
+
+    def group_ids(self):
+        return list(self)
+
+    def viewable_group_ids(self):
+        return [group_id for group_id in self if self.can_view(group_id)]
+
+    def addable_group_ids(self):
+        return [group_id for group_id in self if self.can_add(group_id)]
+
+    def is_member(self, group_id):
+        return self._get(group_id) is not None
+
+    def can_view(self, group_id):
+        membership = self._get(group_id)
+        return membership is not None and (membership.can_view or membership.is_admin)
+
+    def can_add(self, group_id):
+        membership = self._get(group_id)
+        return membership is not None and (membership.can_add or membership.is_admin)
+
+    def is_admin(self, group_id):
+        membership = self._get(group_id)
+        return membership is not None and membership.is_admin
+
+    def _get(self, group_id):
+        # Group ids arrive as ints from URLs and as strings from request bodies
+        try:
+            return self.get(int(group_id))
+        except (TypeError, ValueError):
+            return None
+
+
+def get_memberships(request):
+    """
+    Return the requesting user's memberships, resolved once per request and
+    kept on request.memberships for every later view or permission check.
+    """
+    # DRF's Request proxies attribute reads to the underlying HttpRequest
+    http_request = getattr(request, '_request', request)
+    memberships = getattr(http_request, 'memberships', None)
+    if memberships is None or memberships.user_id != request.user.pk:
+        memberships = Memberships(request.user)
+        http_request.memberships = memberships
+    return memberships
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:42
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_merge_20240929_2048'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='users_group_name_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_group_users_group_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
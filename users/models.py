@@ -2,6 +2,7 @@ from datetime import timedelta
 
 from django.utils import timezone
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
@@ -9,10 +10,42 @@ class Group(models.Model):
     name = models.CharField(
         max_length=100,
     )
+    # Bumped whenever the group's entries, members or filters change
+    data_version = models.PositiveBigIntegerField(
+        default=0,
+    )
     
     def __str__(self):
         return f'{self.name}'
 
+    def save(self, *args, **kwargs):
+        renamed = False
+        if not self._state.adding:
+            renamed = Group.objects.filter(pk=self.pk).exclude(name=self.name).exists()
+            if kwargs.get('update_fields') is None:
+                # data_version only moves through bump_data_version(), so a
+                # stale instance cannot roll it back
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'data_version'
+                ]
+        super().save(*args, **kwargs)
+        if renamed:
+            # Reports and exports show group names, including in the group
+            # list of every entry this group shares with others
+            Group.bump_data_version(
+                Group.objects.filter(models.Q(pk=self.pk) | models.Q(entries__groups=self.pk)).values('pk')
+            )
+
+    @classmethod
+    def bump_data_version(cls, group_ids):
+        cls.objects.filter(pk__in=group_ids).update(data_version=models.F('data_version') + 1)
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='users_group_name_lower_idx'),
+        ]
+
 class UserProfile(models.Model):
     user = models.ForeignKey(
         to=User,
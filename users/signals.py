@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .memberships import invalidate_memberships
+from .models import Group, UserProfile
+
+
+# Covers the invite, leave, remove, toggle and change-admin views, which
+# all go through UserProfile.save() or delete()
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_memberships(sender, instance, **kwargs):
+    user_id, group_id = instance.user_id, instance.group_id
+
+    def invalidate():
+        invalidate_memberships(user_id)
+        Group.bump_data_version([group_id])
+
+    # Concurrent requests can cache the old rows again until the write
+    # commits, so the entry is dropped now and once more after the commit
+    invalidate_memberships(user_id)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_user_memberships(sender, instance, created, **kwargs):
+    # Databases that reuse primary keys could otherwise hand a new user a stale entry
+    if created:
+        user_id = instance.pk
+        invalidate_memberships(user_id)
+        transaction.on_commit(lambda: invalidate_memberships(user_id))
@@ -1,10 +1,14 @@
+import os
+
 from django.test import TestCase
 
 # Create your tests here.
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from .memberships import CACHE_STATS, cached_membership_rows, get_memberships, membership_cache_key
 from .models import Group, UserProfile
 
 class TogglePermissionsViewTests(APITestCase):
@@ -141,4 +145,136 @@ class RemoveUserFromGroupTests(APITestCase):
         }
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertIn('error', response.data)
\ No newline at end of file
+        self.assertIn('error', response.data)
+
+
+class ChangeGroupAdminTests(APITestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass')
+        self.member = User.objects.create_user(username='member', password='memberpass')
+        self.group = Group.objects.create(name='Test Group')
+        UserProfile.objects.create(user=self.admin_user, group=self.group, is_admin=True)
+        UserProfile.objects.create(user=self.member, group=self.group)
+        self.url = reverse('users:change-group-admin', args=[self.group.pk])
+
+    def test_admin_hands_over_the_group(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(self.url, {'username': 'member'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(UserProfile.objects.filter(group=self.group, is_admin=True).values_list('user', flat=True)),
+            [self.member.pk]
+        )
+
+    def test_non_admin_and_non_member(self):
+        outsider = User.objects.create_user(username='outsider', password='outsiderpass')
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(self.url, {'username': 'outsider'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.member)
+        response = self.client.post(self.url, {'username': 'member'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(UserProfile.objects.get(user=self.admin_user).is_admin)
+        self.assertFalse(UserProfile.objects.filter(user=outsider).exists())
+
+
+class MembershipsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='memberpass')
+        self.viewer_group = Group.objects.create(name='Viewer Group')
+        self.admin_group = Group.objects.create(name='Admin Group')
+        self.hidden_group = Group.objects.create(name='Hidden Group')
+        UserProfile.objects.create(user=self.user, group=self.viewer_group, can_add=True)
+        UserProfile.objects.create(user=self.user, group=self.admin_group, is_admin=True, can_view=False)
+        UserProfile.objects.create(user=self.user, group=self.hidden_group, can_view=False)
+
+    def request(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    def test_resolved_once_per_request(self):
+        request = self.request()
+
+        with self.assertNumQueries(1):
+            memberships = get_memberships(request)
+            self.assertIs(get_memberships(request), memberships)
+            self.assertIs(request.memberships, memberships)
+
+        self.assertEqual(
+            sorted(memberships.viewable_group_ids()),
+            sorted([self.viewer_group.pk, self.admin_group.pk])
+        )
+        self.assertTrue(memberships.is_admin(str(self.admin_group.pk)))
+        self.assertFalse(memberships.is_admin(self.viewer_group.pk))
+        self.assertTrue(memberships.is_member(self.hidden_group.pk))
+        self.assertFalse(memberships.can_view(self.hidden_group.pk))
+        self.assertFalse(memberships.can_view('not-a-group'))
+        self.assertEqual(
+            sorted(memberships.addable_group_ids()),
+            sorted([self.viewer_group.pk, self.admin_group.pk])
+        )
+        self.assertFalse(memberships.can_add(self.hidden_group.pk))
+
+    def test_groups_can_view(self):
+        self.client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('users:groups-can-view'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(group['id'] for group in response.data),
+            sorted([self.viewer_group.pk, self.admin_group.pk])
+        )
+
+    def test_cached_across_requests_until_profiles_change(self):
+        get_memberships(self.request())
+        with self.assertNumQueries(0):
+            self.assertTrue(get_memberships(self.request()).can_view(self.viewer_group.pk))
+
+        profile = UserProfile.objects.get(user=self.user, group=self.viewer_group)
+        profile.can_view = False
+        profile.save()
+        with self.assertNumQueries(1):
+            self.assertFalse(get_memberships(self.request()).can_view(self.viewer_group.pk))
+
+        get_memberships(self.request())
+        profile.delete()
+        self.assertFalse(get_memberships(self.request()).is_member(self.viewer_group.pk))
+
+    def test_invalidated_again_once_the_change_commits(self):
+        stale_rows = cached_membership_rows(self.user)
+        version = Group.objects.get(pk=self.admin_group.pk).data_version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user, group=self.admin_group)
+            profile.is_admin = False
+            profile.save()
+            # A concurrent request reading before the commit caches the old rows
+            cache.set(membership_cache_key(self.user.pk), stale_rows)
+
+        self.assertFalse(get_memberships(self.request()).is_admin(self.admin_group.pk))
+        self.assertEqual(Group.objects.get(pk=self.admin_group.pk).data_version, version + 1)
+
+    def test_cache_stats(self):
+        CACHE_STATS.clear()
+        get_memberships(self.request())
+        get_memberships(self.request())
+        get_memberships(self.request())
+
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(reverse('users:membership-cache-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'hits': 2, 'misses': 1, 'hit_rate': 0.6667, 'pid': os.getpid()})
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('users:membership-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -15,9 +15,10 @@ urlpatterns = [
     path('remove-user-from-group/', RemoveUserFromGroup.as_view(), name='remove-user-from-group'),
     path('leave-group/', LeaveGroupView.as_view(), name='leave-group'),
     path('create-group/', CreateGroup.as_view(), name = 'create-group'),
-    path('groups/<int:pk>/change-admin/', ChangeGroupAdminView.as_view(), name='change-group-admin'),
+    path('groups/<int:group_pk>/change-admin/', ChangeGroupAdminView.as_view(), name='change-group-admin'),
     path('toggle-permissions/', TogglePermissionsView.as_view(), name='toggle-permissions'),
     path('groups-can-view/', UserGroupsCanView.as_view(), name="groups-can-view"),
+    path('membership-cache-stats/', MembershipCacheStatsView.as_view(), name='membership-cache-stats'),
 
     ## Invitations
     path('invitations/', InviteListView.as_view(), name='invite-list'),
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from django.db.utils import IntegrityError
 from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
 from django.core.signing import Signer
 from django.core.mail import EmailMultiAlternatives
@@ -14,6 +16,7 @@ from rest_framework.exceptions import APIException
 
 from robson_insight import settings
 from .serializers import *
+from .memberships import get_memberships, membership_cache_stats
 from .models import UserProfile, Group, Invite
 from .permissions import IsInGroup, IsGroupAdmin
 
@@ -62,7 +65,7 @@ class CreateGroup(APIView):
             return Response({'error': 'Group name must be at least 5 characters'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            if Group.objects.filter(name__iexact=group_name).exists():
+            if Group.objects.alias(name_lower=Lower('name')).filter(name_lower=Lower(Value(group_name))).exists():
                 return Response({'error': 'A group with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
             group = Group.objects.create(name=group_name)
@@ -117,8 +120,7 @@ class AddUserToGroupView(APIView):
             user = User.objects.get(username__iexact=username)
             group = Group.objects.get(id=group_id)
 
-            requesting_user_admin = UserProfile.objects.get(user=request.user, group=group).is_admin
-            if not requesting_user_admin:
+            if not get_memberships(request).is_admin(group.pk):
                 return Response({'error': 'You are not authorized to add users to this group.'}, status=status.HTTP_403_FORBIDDEN)
 
             user_profile, created = UserProfile.objects.get_or_create(user=user, group=group)
@@ -149,14 +151,14 @@ class RemoveUserFromGroup(APIView):
         try:
             user = User.objects.get(username=username)
             group = Group.objects.get(id=group_id)
-            user_profile = UserProfile.objects.get(user=user, group=group)
-            num_user_profiles = UserProfile.objects.filter(user=request.user).count()
+            memberships = get_memberships(request)
 
-            requesting_user_admin = UserProfile.objects.get(user=request.user, group=group).is_admin
-            if not requesting_user_admin:
+            if not memberships.is_admin(group.pk):
                 return Response({'error': 'You are not authorized to remove users from this group.'}, status=status.HTTP_403_FORBIDDEN)
+
+            user_profile = UserProfile.objects.get(user=user, group=group)
             
-            if num_user_profiles <= 1:
+            if len(memberships) <= 1:
                 return Response({'error': 'You must be a member of at least one group.'}, status=status.HTTP_403_FORBIDDEN)
 
             user_profile.delete()
@@ -254,7 +256,6 @@ class ChangeGroupAdminView(APIView):
         try:
             group = Group.objects.get(pk=group_pk)
             new_admin_user = User.objects.get(username__iexact=new_admin_username)
-            new_admin_profile = UserProfile.objects.get(user=new_admin_user, group=group)
         except Group.DoesNotExist:
             return Response(
                 {'error': 'Group not found.'},
@@ -265,24 +266,24 @@ class ChangeGroupAdminView(APIView):
                 {'error': 'User not found.'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        except UserProfile.DoesNotExist:
-            return Response(
-                {'error': 'User is not a member of the group.'},
-                status=status.HTTP_404_NOT_FOUND
-            )
         except Exception as e:
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        current_admin_profile = UserProfile.objects.get(user=request.user, group=group, is_admin=True)
-
-        if current_admin_profile.user != request.user:
+        # IsGroupAdmin has already confirmed the requester is this group's admin
+        profiles = {
+            profile.user_id: profile
+            for profile in UserProfile.objects.filter(group=group, user__in=[request.user, new_admin_user])
+        }
+        if new_admin_user.pk not in profiles:
             return Response(
-                {'error': 'You are not authorized to change the admin of this group.'},
-                status=status.HTTP_403_FORBIDDEN
+                {'error': 'User is not a member of the group.'},
+                status=status.HTTP_404_NOT_FOUND
             )
+        current_admin_profile = profiles[request.user.pk]
+        new_admin_profile = profiles[new_admin_user.pk]
 
         try:
             with transaction.atomic():
@@ -448,8 +449,7 @@ class TogglePermissionsView(APIView):
 
         try:
             group = Group.objects.get(id=group_id)
-            current_admin_profile = UserProfile.objects.get(user=request.user,group=group)
-            if not current_admin_profile.is_admin:
+            if not get_memberships(request).is_admin(group.pk):
                 return Response({"error": "You are not authorized to toggle permissions."}, status=status.HTTP_403_FORBIDDEN)
 
             target_user = User.objects.get(username=username)
@@ -478,14 +478,21 @@ class InviteListView(generics.ListAPIView):
         user = self.request.user
         return Invite.objects.filter(email=user)
         
+class MembershipCacheStatsView(APIView):
+    """
+    Membership cache hit rate of the worker process that answers, not of
+    the whole deployment: the counters live in process memory, and with the
+    default LocMemCache so do the cached memberships themselves. Poll
+    repeatedly and group by pid to see every worker.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(membership_cache_stats(), status=status.HTTP_200_OK)
+
 class UserGroupsCanView(generics.ListAPIView):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        user_profile = UserProfile.objects.filter(user=user, can_view=True)
-        
-        if user_profile.exists():
-            return Group.objects.filter(userprofile__in=user_profile)
-        return Group.objects.none()
+        return Group.objects.filter(pk__in=get_memberships(self.request).viewable_group_ids())